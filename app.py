@@ -5,21 +5,28 @@ A modular, production-ready AI system for empathetic conversation.
 
 import streamlit as st
 import logging
-import uuid
-from datetime import datetime
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from typing import Dict, List
 
 # Import our modular components
+from src import setup_logging
 from src.auth import require_authentication, logout, get_current_user_id
-from src.emotion import detect_emotion
-from src.sentiment_fusion import fuse_sentiment_emotion
-from src.response_generator import craft_empathy_response, get_generator
+from src.chat_types import ChatMessage, render_emotion_badge
+from src.emotion import EmotionDetector, detect_emotion_and_sentiment, get_detector
+from src.response_generator import craft_empathy_response_stream, get_generator
 from src.memory import create_memory_manager
-from src.n8n_integration import post_emotion_record, test_n8n_connection
-from src.llm_response import check_api_health
+from src.n8n_integration import queue_emotion_record, test_n8n_connection
+from src.llm_response import check_api_health, get_client
+from src.sentiment_fusion import get_fusion, load_fusion_in_background
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Page configuration
@@ -31,7 +38,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better UI
-st.markdown("""
+_EMPATHY_CSS = """
 <style>
     .main-header {
         text-align: center;
@@ -67,7 +74,82 @@ st.markdown("""
         text-align: center;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.html(_EMPATHY_CSS)
+
+# Messages rendered up front; older ones go in a collapsed expander
+VISIBLE_MESSAGES = 50
+# Detected emotions kept in session state
+EMOTION_BUFFER_SIZE = 50
+
+EMOTION_COLORS = MappingProxyType({
+    'joy': '#4CAF50',
+    'sadness': '#2196F3',
+    'anger': '#F44336',
+    'fear': '#FF9800',
+    'surprise': '#9C27B0',
+    'disgust': '#795548',
+    'neutral': '#9E9E9E'
+})
+
+@st.cache_resource
+def _get_analysis_executor() -> ThreadPoolExecutor:
+    """Process-wide pool that runs emotion analysis off the script thread."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="empathy-analysis")
+
+@st.cache_resource(show_spinner=False)
+def _get_detector() -> EmotionDetector:
+    """Emotion detector held in Streamlit's resource cache."""
+    # Sentiment fusion follows detection, so load its models alongside
+    load_fusion_in_background()
+    return get_detector()
+
+def _analyze_message(text: str):
+    """Detect emotion and fuse it with sentiment, loading the models on first use."""
+    _get_detector()
+    return detect_emotion_and_sentiment(text)
+
+def _load_models():
+    """Construct the emotion, sentiment and Gemini singletons."""
+    try:
+        _get_detector()
+        get_fusion()
+        get_client()
+        logger.info("Models prewarmed")
+    except Exception as e:
+        logger.error(f"Model prewarm failed: {e}")
+
+@st.cache_resource(show_spinner=False)
+def _prewarm_models() -> threading.Thread:
+    """Start loading the models in the background once per process."""
+    thread = threading.Thread(target=_load_models, name="empathy-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+# Opt-in so short-lived processes (tests, tooling) don't load the models
+if os.getenv("EMPATHYAI_PREWARM") == "1":
+    _prewarm_models()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _cached_api_health() -> Dict:
+    """LLM API health, rechecked at most every 30 seconds."""
+    return check_api_health()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _cached_n8n_status() -> Dict:
+    """n8n connection status, rechecked at most every 30 seconds."""
+    return test_n8n_connection()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_emotion_patterns(_memory, user_id: str, days: int) -> Dict:
+    """Emotion patterns for a user, cached per (user_id, days)."""
+    return _memory.get_emotion_patterns(days=days)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_conversation_history(_memory, user_id: str, session_id: str,
+                                 limit: int, turn_count: int) -> List[Dict]:
+    """Stored conversation history, invalidated whenever a turn is added."""
+    return _memory.get_conversation_history(session_id, limit=limit)
 
 class EmpathyAIApp:
     """Main application class for EmpathyAI."""
@@ -85,15 +167,20 @@ class EmpathyAIApp:
             st.session_state.conversation_history = []
 
         if 'current_session_id' not in st.session_state:
-            st.session_state.current_session_id = str(uuid.uuid4())
+            st.session_state.current_session_id = secrets.token_hex(8)
 
         self.session_id = st.session_state.current_session_id
 
         if 'message_count' not in st.session_state:
             st.session_state.message_count = 0
 
-        if 'emotions_detected' not in st.session_state:
-            st.session_state.emotions_detected = []
+        if not isinstance(st.session_state.get('emotions_detected'), deque):
+            st.session_state.emotions_detected = deque(
+                st.session_state.get('emotions_detected', []), maxlen=EMOTION_BUFFER_SIZE
+            )
+
+        if 'session_start_monotonic' not in st.session_state:
+            st.session_state.session_start_monotonic = time.monotonic()
 
     def authenticate_user(self):
         """Handle user authentication."""
@@ -122,14 +209,16 @@ class EmpathyAIApp:
             # Recent emotions
             if st.session_state.emotions_detected:
                 st.markdown("### 🎭 Emotions Detected")
-                for emotion in st.session_state.emotions_detected[-5:]:
-                    confidence = emotion.get('confidence', 0.5)
-                    color = self._get_emotion_color(emotion['label'])
-                    st.markdown(
-                        f'<span class="emotion-badge" style="background-color: {color}; color: white;">'
-                        f'{emotion["label"]} ({confidence:.1%})</span>',
-                        unsafe_allow_html=True
-                    )
+                recent_emotions = list(st.session_state.emotions_detected)[-5:]
+                st.markdown(
+                    "".join(
+                        emotion.get("badge_html") or self._build_emotion_badge(
+                            emotion["label"], emotion.get("confidence", 0.5)
+                        )
+                        for emotion in recent_emotions
+                    ),
+                    unsafe_allow_html=True
+                )
 
             # System status
             st.markdown("---")
@@ -148,35 +237,30 @@ class EmpathyAIApp:
 
     def _get_session_duration(self) -> str:
         """Get formatted session duration."""
-        if 'session_start_time' not in st.session_state:
-            st.session_state.session_start_time = datetime.now()
-
-        duration = datetime.now() - st.session_state.session_start_time
-        minutes = int(duration.total_seconds() // 60)
+        minutes = int((time.monotonic() - st.session_state.session_start_monotonic) // 60)
         return f"{minutes} min"
 
     def _get_emotion_color(self, emotion: str) -> str:
         """Get color for emotion badge."""
-        color_map = {
-            'joy': '#4CAF50',
-            'sadness': '#2196F3', 
-            'anger': '#F44336',
-            'fear': '#FF9800',
-            'surprise': '#9C27B0',
-            'disgust': '#795548',
-            'neutral': '#9E9E9E'
-        }
-        return color_map.get(emotion.lower(), '#9E9E9E')
+        return EMOTION_COLORS.get(emotion.lower(), '#9E9E9E')
+
+    def _build_emotion_badge(self, label: str, confidence: float) -> str:
+        """Build the sidebar badge HTML for a detected emotion."""
+        return render_emotion_badge(label, confidence, self._get_emotion_color(label))
 
     def _show_system_status(self):
         """Show system component status."""
+        if st.button("🔄 Refresh status", use_container_width=True):
+            _cached_api_health.clear()
+            _cached_n8n_status.clear()
+
         # Check LLM API
-        api_health = check_api_health()
+        api_health = _cached_api_health()
         api_status = "✅" if api_health.get("available") else "⚠️"
         st.text(f"{api_status} LLM API")
 
         # Check n8n integration
-        n8n_status = test_n8n_connection()
+        n8n_status = _cached_n8n_status()
         n8n_icon = "✅" if n8n_status.get("connected") else "⚠️"
         st.text(f"{n8n_icon} n8n Integration")
 
@@ -187,7 +271,7 @@ class EmpathyAIApp:
     def _show_user_analytics(self):
         """Show user analytics in sidebar."""
         try:
-            patterns = self.memory.get_emotion_patterns(days=7)
+            patterns = _cached_emotion_patterns(self.memory, self.user_id, 7)
             if patterns.get("total_entries", 0) > 0:
                 st.markdown("### 📈 7-Day Insights")
                 st.metric("Total Conversations", patterns["total_entries"])
@@ -225,29 +309,33 @@ class EmpathyAIApp:
 
     def _display_conversation_history(self):
         """Display the conversation history."""
-        for message in st.session_state.conversation_history:
-            if message["role"] == "user":
-                with st.container():
-                    st.markdown(
-                        f'<div class="chat-message user-message">'
-                        f'<strong>You:</strong> {message["content"]}</div>',
-                        unsafe_allow_html=True
-                    )
-            else:
-                with st.container():
-                    st.markdown(
-                        f'<div class="chat-message ai-message">'
-                        f'<strong>EmpathyAI:</strong> {message["content"]}</div>',
-                        unsafe_allow_html=True
-                    )
-
-                    # Show emotion metadata if available
-                    if "emotion_data" in message:
-                        emotion_data = message["emotion_data"]
-                        st.caption(
-                            f"🎭 Detected: {emotion_data.get('emotion_detected', 'unknown')} "
-                            f"(Confidence: {emotion_data.get('confidence', 0):.1%})"
-                        )
+        history = st.session_state.conversation_history
+        older, recent = history[:-VISIBLE_MESSAGES], history[-VISIBLE_MESSAGES:]
+
+        # Keep older messages collapsed so the visible chat stays short
+        if older:
+            with st.expander(f"Earlier messages ({len(older)})"):
+                for message in older:
+                    self._render_message(message)
+
+        for message in recent:
+            self._render_message(message)
+
+    def _render_message(self, message: ChatMessage):
+        """Render a single chat message with its emotion metadata."""
+        with st.chat_message(message.role):
+            st.markdown(message.rendered_html, unsafe_allow_html=True)
+
+            # Show emotion metadata if available
+            if message.emotion_data:
+                self._render_emotion_caption(message.emotion_data)
+
+    def _render_emotion_caption(self, emotion_data: Dict):
+        """Render the detected-emotion caption under an assistant message."""
+        st.caption(
+            f"🎭 Detected: {emotion_data.get('emotion_detected', 'unknown')} "
+            f"(Confidence: {emotion_data.get('confidence', 0):.1%})"
+        )
 
     def _handle_chat_input(self):
         """Handle chat input and generate responses."""
@@ -259,28 +347,26 @@ class EmpathyAIApp:
     def _process_user_message(self, user_input: str):
         """Process user message and generate AI response."""
         try:
-            # Add user message to history
-            st.session_state.conversation_history.append({
-                "role": "user",
-                "content": user_input,
-                "timestamp": datetime.now().isoformat()
-            })
-
-            # Detect emotion
-            emotion_result = detect_emotion(user_input)
-            emotion_label = emotion_result.get("label", "neutral")
-            confidence = emotion_result.get("confidence", 0.5)
+            # Detect emotion and fuse it with sentiment in the background
+            # while the user message is rendered and history is loaded
+            emotion_future = _get_analysis_executor().submit(_analyze_message, user_input)
 
-            # Fuse sentiment with emotion
-            fused_emotion = fuse_sentiment_emotion(user_input, emotion_label)
+            # Add user message to history and show it right away
+            user_message = ChatMessage.create("user", user_input)
+            st.session_state.conversation_history.append(user_message)
+            self._render_message(user_message)
 
-            # Get conversation history for context
+            # Conversation state lives in the generator; only load stored
+            # history when this process has not seen the session yet
             history = []
-            if self.memory:
-                history = self.memory.get_conversation_history(self.session_id, limit=3)
+            if self.memory and not get_generator().has_session(self.session_id):
+                history = _cached_conversation_history(
+                    self.memory, self.user_id, self.session_id, 3,
+                    st.session_state.message_count
+                )
 
-            # Generate empathetic response
-            ai_response = craft_empathy_response(user_input, fused_emotion, history)
+            # The prompt is conditioned on the emotion, so wait for it here
+            emotion_label, confidence, fused_emotion = emotion_future.result()
 
             # Store emotion data
             emotion_data = {
@@ -289,54 +375,71 @@ class EmpathyAIApp:
                 "primary_emotion": emotion_label
             }
 
+            # Stream the empathetic response into the chat as it is generated
+            response_stream = craft_empathy_response_stream(
+                user_input, fused_emotion, history,
+                session_id=self.session_id, user_id=self.user_id
+            )
+            with st.chat_message("assistant"):
+                placeholder = st.empty()
+                with placeholder.container():
+                    st.write_stream(response_stream)
+
+                # Swap in the validated response with the usual styling
+                ai_response = response_stream.response
+                assistant_message = ChatMessage.create("assistant", ai_response, emotion_data)
+                placeholder.markdown(assistant_message.rendered_html, unsafe_allow_html=True)
+                self._render_emotion_caption(emotion_data)
+
             # Add AI response to history
-            st.session_state.conversation_history.append({
-                "role": "assistant", 
-                "content": ai_response,
-                "timestamp": datetime.now().isoformat(),
-                "emotion_data": emotion_data
-            })
+            st.session_state.conversation_history.append(assistant_message)
 
             # Update session tracking
             st.session_state.message_count += 1
             st.session_state.emotions_detected.append({
                 "label": emotion_label,
                 "confidence": confidence,
-                "fused": fused_emotion
+                "fused": fused_emotion,
+                "badge_html": self._build_emotion_badge(emotion_label, confidence)
             })
 
-            # Save to memory
-            if self.memory:
-                self.memory.add_emotion_record(
-                    emotion_label=fused_emotion,
-                    confidence=confidence,
-                    message=user_input,
-                    response=ai_response,
-                    session_id=self.session_id
-                )
+            # Queue the n8n record, then save to memory
+            self._dispatch_writes(user_input, ai_response, fused_emotion, confidence)
 
-                self.memory.add_conversation_context(
-                    user_message=user_input,
-                    ai_response=ai_response,
-                    session_id=self.session_id
-                )
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+            st.error("I'm having trouble processing your message right now. Please try again.")
 
-            # Send to n8n for analytics
-            post_emotion_record(
-                user_id=self.user_id,
+    def _dispatch_writes(self, user_input: str, ai_response: str,
+                         fused_emotion: str, confidence: float):
+        """
+        Queue the turn for n8n analytics, then persist it to memory.
+
+        These writes used to run concurrently on a thread pool. Neither needs
+        to any more: the n8n record goes to a background queue, and add_turn
+        only appends both rows to the memory write-behind buffer, which a
+        timer flushes in one transaction. So add_turn runs synchronously on
+        the script thread.
+        """
+        # Delivered later by the n8n background worker
+        queue_emotion_record(
+            user_id=self.user_id,
+            emotion_label=fused_emotion,
+            confidence=confidence,
+            message=user_input,
+            session_id=self.session_id
+        )
+
+        # Emotion record and conversation context go in one transaction
+        if self.memory:
+            self.memory.add_turn(
+                user_message=user_input,
+                ai_response=ai_response,
                 emotion_label=fused_emotion,
                 confidence=confidence,
-                message=user_input,
                 session_id=self.session_id
             )
 
-            # Rerun to show new messages
-            st.rerun()
-
-        except Exception as e:
-            logger.error(f"Error processing message: {e}")
-            st.error("I'm having trouble processing your message right now. Please try again.")
-
     def run(self):
         """Run the main application."""
         try:
@@ -0,0 +1,78 @@
+"""
+Shared pytest fixtures for the EmpathyAI test suite.
+Heavy components are created once per test session and reused by every test.
+"""
+
+import logging
+
+import pytest
+
+from src import setup_logging
+
+setup_logging(level=logging.INFO)
+
+@pytest.fixture(scope="session")
+def detector():
+    """Process-wide emotion detector, loaded once."""
+    from src.emotion import get_detector
+    return get_detector()
+
+@pytest.fixture(scope="session")
+def fusion():
+    """Process-wide sentiment fusion models, loaded once."""
+    from src.sentiment_fusion import get_fusion
+    return get_fusion()
+
+@pytest.fixture(scope="session")
+def generator():
+    """Process-wide empathy response generator."""
+    from src.response_generator import get_generator
+    return get_generator()
+
+@pytest.fixture(scope="session")
+def memory_manager():
+    """Memory manager for the test user on a shared in-memory SQLite database."""
+    from src.memory import create_memory_manager
+
+    with pytest.MonkeyPatch.context() as mp:
+        # Pooled connections keep the database alive; nothing is left on disk
+        mp.setenv("EMPATHYAI_DB_PATH", "file:empathy_test?mode=memory&cache=shared")
+        memory = create_memory_manager("test_user_123")
+        yield memory
+        memory.close()
+
+@pytest.fixture(scope="session")
+def auth_manager():
+    """Process-wide auth manager."""
+    from src.auth import get_auth_manager
+    return get_auth_manager()
+
+@pytest.fixture(scope="session")
+def n8n():
+    """Process-wide n8n integration; its keep-alive session is closed after the run."""
+    from src.n8n_integration import get_n8n_integration
+    integration = get_n8n_integration()
+    yield integration
+    integration.session.close()
+
+# Recorded Gemini reply, replayed instead of calling the API
+RECORDED_GEMINI_REPLY = "Hello"
+
+def _replay_gemini(self, prompt, **kwargs):
+    """Stand-in for GeminiClient.stream_response."""
+    return iter([RECORDED_GEMINI_REPLY])
+
+@pytest.fixture
+def recorded_gemini(monkeypatch):
+    """Make Gemini clients replay the recorded reply for one test."""
+    from src.llm_response import GeminiClient
+    monkeypatch.setattr(GeminiClient, "stream_response", _replay_gemini)
+    return RECORDED_GEMINI_REPLY
+
+@pytest.fixture(scope="session")
+def gemini_health():
+    """Gemini health probe, run once per session against the recorded reply."""
+    from src.llm_response import GeminiClient, check_api_health
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(GeminiClient, "stream_response", _replay_gemini)
+        return check_api_health()
@@ -3,21 +3,49 @@ EmpathyAI - Modular Mental Health Assistant
 A comprehensive AI system for empathetic conversation and emotional support.
 """
 
+import importlib
+import logging
+
 __version__ = "2.0.0"
 __author__ = "Aditya Kumar Singh"
 
-# Import main components for easy access
-from .emotion import detect_emotion, get_detector
-from .sentiment_fusion import fuse_sentiment_emotion, get_fusion  
-from .llm_response import ask_gemini, get_client
-from .response_generator import craft_empathy_response, get_generator
-from .memory import create_memory_manager
-from .n8n_integration import post_emotion_record, test_n8n_connection
-from .auth import login, logout, require_authentication
+# Main components for easy access, imported on first attribute access so
+# that `import src` doesn't load transformers, torch, genai and requests
+_LAZY = {
+    'detect_emotion': '.emotion',
+    'detect_emotion_and_sentiment': '.emotion',
+    'get_detector': '.emotion',
+    'fuse_sentiment_emotion': '.sentiment_fusion',
+    'get_fusion': '.sentiment_fusion',
+    'ask_gemini': '.llm_response',
+    'get_client': '.llm_response',
+    'craft_empathy_response': '.response_generator',
+    'get_generator': '.response_generator',
+    'create_memory_manager': '.memory',
+    'post_emotion_record': '.n8n_integration',
+    'test_n8n_connection': '.n8n_integration',
+    'login': '.auth',
+    'logout': '.auth',
+    'require_authentication': '.auth',
+}
+
+def setup_logging(level: int = logging.INFO) -> None:
+    """Configure root logging; entry points call this, library modules never do."""
+    logging.basicConfig(level=level)
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(_LAZY[name], __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
 
 __all__ = [
+    'setup_logging',
     'detect_emotion',
-    'fuse_sentiment_emotion', 
+    'detect_emotion_and_sentiment',
+    'fuse_sentiment_emotion',
     'ask_gemini',
     'craft_empathy_response',
     'create_memory_manager',
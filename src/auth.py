@@ -4,7 +4,10 @@ Provides secure user authentication with session management.
 """
 
 import os
+import atexit
+import functools
 import logging
+import time
 from typing import Dict, Tuple, Optional
 import streamlit as st
 
@@ -18,11 +21,72 @@ except ImportError:
     GOOGLE_AUTH_AVAILABLE = False
     logger.warning("streamlit-google-auth not available - using simple auth fallback")
 
+# Connected Google sessions skip revalidation until they are within
+# EXPIRY_MARGIN of token_exp. streamlit-google-auth keeps the ID token to
+# itself, so expiry is counted from the last successful check.
+TOKEN_LIFETIME = 3600  # seconds
+EXPIRY_MARGIN = 300  # seconds
+
+class TokenCache:
+    """Serves a validated Google session until it is close to expiry."""
+
+    def __init__(self, authenticator):
+        self.authenticator = authenticator
+
+    def is_valid(self) -> bool:
+        """Check whether the session is connected and not close to expiry."""
+        token_exp = st.session_state.get('token_exp')
+        return (
+            st.session_state.get('connected', False)
+            and token_exp is not None
+            and token_exp > time.time() + EXPIRY_MARGIN
+        )
+
+    def ensure_valid(self):
+        """Revalidate the session with the authenticator unless it is still valid."""
+        if self.is_valid():
+            return
+        self.authenticator.check_authentification()
+        if st.session_state.get('connected', False):
+            st.session_state['token_exp'] = time.time() + TOKEN_LIFETIME
+
+def _remove_file(path: str):
+    """Delete a file if it still exists."""
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+@functools.lru_cache(maxsize=1)
+def _google_auth_config_state() -> Tuple[bool, Optional[str]]:
+    """
+    Probe Google OAuth configuration once per process.
+
+    Returns:
+        tuple: (configured, credentials_file_path or None when using secrets)
+    """
+    try:
+        # Check for credentials file
+        creds_path = os.getenv("GOOGLE_CREDENTIALS_PATH", "google_credentials.json")
+        if os.path.exists(creds_path):
+            return True, creds_path
+
+        # Check streamlit secrets
+        if hasattr(st, 'secrets'):
+            required_secrets = ["google_client_id", "google_client_secret", "cookie_key"]
+            return all(secret in st.secrets for secret in required_secrets), None
+
+        return False, None
+    except Exception as e:
+        logger.error(f"Error checking Google auth config: {e}")
+        return False, None
+
 class AuthManager:
     """Manages user authentication with multiple backends."""
 
     def __init__(self):
         self.authenticator = None
+        self.token_cache = None
         self.auth_method = "simple"  # Default fallback
         self._init_auth_system()
 
@@ -36,29 +100,16 @@ class AuthManager:
 
     def _google_auth_configured(self) -> bool:
         """Check if Google OAuth is properly configured."""
-        try:
-            # Check for credentials file
-            creds_path = os.getenv("GOOGLE_CREDENTIALS_PATH", "google_credentials.json")
-            if os.path.exists(creds_path):
-                return True
-
-            # Check streamlit secrets
-            if hasattr(st, 'secrets'):
-                required_secrets = ["google_client_id", "google_client_secret", "cookie_key"]
-                return all(secret in st.secrets for secret in required_secrets)
-
-            return False
-        except Exception as e:
-            logger.error(f"Error checking Google auth config: {e}")
-            return False
+        configured, _ = _google_auth_config_state()
+        return configured
 
     def _init_google_auth(self):
         """Initialize Google OAuth authentication."""
         try:
             # Try file-based credentials first
-            creds_path = os.getenv("GOOGLE_CREDENTIALS_PATH", "google_credentials.json")
+            _, creds_path = _google_auth_config_state()
 
-            if os.path.exists(creds_path):
+            if creds_path:
                 self.authenticator = Authenticate(
                     secret_credentials_path=creds_path,
                     cookie_name="empathy_auth",
@@ -66,23 +117,9 @@ class AuthManager:
                     redirect_uri=st.secrets.get("redirect_uri", "http://localhost:8501")
                 )
             else:
-                # Use streamlit secrets
-                # Create temporary credentials file
-                import json
-                import tempfile
-
-                creds_data = {
-                    "web": {
-                        "client_id": st.secrets["google_client_id"],
-                        "client_secret": st.secrets["google_client_secret"],
-                        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                        "token_uri": "https://oauth2.googleapis.com/token"
-                    }
-                }
-
-                with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json') as f:
-                    json.dump(creds_data, f)
-                    temp_creds_path = f.name
+                # Use streamlit secrets, via a temp credentials file written
+                # once per process
+                temp_creds_path = self._get_temp_creds_path()
 
                 self.authenticator = Authenticate(
                     secret_credentials_path=temp_creds_path,
@@ -91,6 +128,7 @@ class AuthManager:
                     redirect_uri=st.secrets.get("redirect_uri", "http://localhost:8501")
                 )
 
+            self.token_cache = TokenCache(self.authenticator)
             self.auth_method = "google"
             logger.info("Google OAuth authentication initialized")
 
@@ -98,6 +136,33 @@ class AuthManager:
             logger.error(f"Failed to initialize Google auth: {e}")
             self.auth_method = "simple"
 
+    @classmethod
+    def _get_temp_creds_path(cls) -> str:
+        """Write the OAuth client secrets to a temp file once and reuse it."""
+        cached_path = getattr(cls, "_cached_creds_path", None)
+        if cached_path and os.path.exists(cached_path):
+            return cached_path
+
+        import json
+        import tempfile
+
+        creds_data = {
+            "web": {
+                "client_id": st.secrets["google_client_id"],
+                "client_secret": st.secrets["google_client_secret"],
+                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+                "token_uri": "https://oauth2.googleapis.com/token"
+            }
+        }
+
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json') as f:
+            json.dump(creds_data, f)
+            cls._cached_creds_path = f.name
+
+        # Secrets shouldn't outlive the process on disk
+        atexit.register(_remove_file, cls._cached_creds_path)
+        return cls._cached_creds_path
+
     def login(self) -> Tuple[bool, Dict]:
         """
         Handle user login process.
@@ -113,8 +178,8 @@ class AuthManager:
     def _google_login(self) -> Tuple[bool, Dict]:
         """Handle Google OAuth login."""
         try:
-            # Check authentication status
-            self.authenticator.check_authentification()
+            # Check authentication status (cached until close to expiry)
+            self.token_cache.ensure_valid()
 
             # Show login button if not authenticated
             if not st.session_state.get('connected', False):
@@ -178,7 +243,8 @@ class AuthManager:
             del st.session_state.simple_auth_user
 
         # Clear other session data
-        keys_to_clear = ['connected', 'user_info', 'oauth_id', 'conversation_history']
+        keys_to_clear = ['connected', 'user_info', 'oauth_id', 'conversation_history',
+                         'token_exp']
         for key in keys_to_clear:
             if key in st.session_state:
                 del st.session_state[key]
@@ -220,15 +286,10 @@ class AuthManager:
 
         return user_info
 
-# Global auth manager
-_auth_manager = None
-
+@st.cache_resource
 def get_auth_manager() -> AuthManager:
-    """Get or create global auth manager."""
-    global _auth_manager
-    if _auth_manager is None:
-        _auth_manager = AuthManager()
-    return _auth_manager
+    """Get or create the process-wide auth manager."""
+    return AuthManager()
 
 def login() -> Tuple[bool, Dict]:
     """
@@ -0,0 +1,57 @@
+"""
+Chat message type and precompiled HTML templates for the chat interface.
+Messages carry their rendered HTML so reruns never rebuild it.
+"""
+
+import html
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional
+
+# Bound str.format methods, compiled once at import
+_MESSAGE_TEMPLATES = {
+    "user": '<div class="chat-message user-message">{content}</div>'.format,
+    "assistant": '<div class="chat-message ai-message">{content}</div>'.format,
+}
+_BADGE_TEMPLATE = (
+    '<span class="emotion-badge" style="background-color: {color}; color: white;">'
+    '{label} ({confidence:.1%})</span>'
+).format
+
+class ChatMessage(NamedTuple):
+    """A single chat message with its HTML rendered at creation time."""
+
+    role: str
+    content: str
+    rendered_html: str
+    timestamp: str
+    emotion_data: Optional[Dict] = None
+
+    @classmethod
+    def create(cls, role: str, content: str, emotion_data: Optional[Dict] = None) -> "ChatMessage":
+        """
+        Build a message, rendering its HTML once.
+
+        Args:
+            role (str): 'user' or 'assistant'
+            content (str): Message text
+            emotion_data (dict): Optional emotion metadata for assistant messages
+
+        Returns:
+            ChatMessage: The new message
+        """
+        return cls(
+            role=role,
+            content=content,
+            rendered_html=render_message_html(role, content),
+            timestamp=datetime.now().isoformat(),
+            emotion_data=emotion_data
+        )
+
+def render_message_html(role: str, content: str) -> str:
+    """Render escaped message text into its chat bubble."""
+    template = _MESSAGE_TEMPLATES.get(role, _MESSAGE_TEMPLATES["assistant"])
+    return template(content=html.escape(content).replace("\n", "<br>"))
+
+def render_emotion_badge(label: str, confidence: float, color: str) -> str:
+    """Render the sidebar badge for a detected emotion."""
+    return _BADGE_TEMPLATE(label=html.escape(label), confidence=confidence, color=color)
@@ -3,19 +3,81 @@ Advanced emotion detection using HuggingFace transformers.
 Provides reliable emotion classification with confidence scoring.
 """
 
-from transformers import pipeline
+import contextlib
+import functools
+import importlib.util
 import logging
-from typing import Dict, List, Optional
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence, Tuple, TypedDict
+
+from .sentiment_fusion import combine_labels, get_fusion
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+
+# Shorter (stripped) texts are reported as neutral without running the model
+MIN_TEXT_LENGTH = 5
+
+# Inputs are truncated by the tokenizer to this many tokens
+MAX_INPUT_TOKENS = 256
+
+# Optional ONNX Runtime backend (pip install "optimum[onnxruntime]")
+ONNX_AVAILABLE = importlib.util.find_spec("optimum") is not None
+ONNX_CACHE_DIR = os.path.join(
+    os.getenv("EMPATHYAI_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "empathyai")),
+    "emotion-onnx-int8"
+)
+ONNX_MODEL_FILE = "model_quantized.onnx"
+
+# Optional Intel Extension for PyTorch, used for bfloat16 on CPUs that support it
+IPEX_AVAILABLE = importlib.util.find_spec("intel_extension_for_pytorch") is not None
+
+# Micro-batching: requests arriving within BATCH_WAIT seconds share a forward pass
+MAX_BATCH_SIZE = 8
+BATCH_WAIT = 0.01
+RESULT_TIMEOUT = 30  # seconds
+
+# Texts per forward pass for detect_emotions_batch
+DIRECT_BATCH_SIZE = 32
+
+# Process-wide LRU of emotion results keyed on the stripped text
+EMOTION_CACHE_SIZE = 1024
+
+# Emotion confidence above which sentiment fusion is skipped
+FUSION_SKIP_CONFIDENCE = 0.9
+
+# Sentiment implied by each emotion label, used when fusion is skipped
+EMOTION_POLARITY = {
+    "joy": "positive",
+    "surprise": "neutral",
+    "neutral": "neutral",
+    "sadness": "negative",
+    "anger": "negative",
+    "fear": "negative",
+    "disgust": "negative"
+}
+
+class EmotionResult(TypedDict):
+    """Shape of every emotion detection result."""
+    label: str
+    confidence: float
+    all_scores: List[Dict]  # [{"label": str, "score": float}], highest first
+
 class EmotionDetector:
     """Singleton emotion detection class for efficient model loading."""
 
     _instance = None
-    _pipeline = None
+    _model = None
+    _tokenizer = None
+    _labels = None
+    _bf16 = False
+    _queue = None
+    _worker_lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
@@ -23,20 +85,137 @@ class EmotionDetector:
         return cls._instance
 
     def __init__(self):
-        if self._pipeline is None:
+        if self._model is None:
             try:
-                self._pipeline = pipeline(
-                    "text-classification",
-                    model="j-hartmann/emotion-english-distilroberta-base",
-                    top_k=None,
-                    device=-1  # Use CPU for compatibility
-                )
+                # Deferred so importing this module doesn't load transformers/torch
+                from transformers import AutoTokenizer
+
+                model = None
+                if self._cuda_available():
+                    model = self._load_gpu_model()
+                if model is None and ONNX_AVAILABLE:
+                    model = self._load_onnx_model()
+
+                if model is None:
+                    model = self._load_cpu_model()
+
+                self._tokenizer = AutoTokenizer.from_pretrained(EMOTION_MODEL)
+                id2label = model.config.id2label
+                self._labels = tuple(id2label[i] for i in range(len(id2label)))
+                self._model = model
                 logger.info("Emotion detection model loaded successfully")
+                self._start_batch_worker()
             except Exception as e:
                 logger.error(f"Failed to load emotion model: {e}")
                 raise
 
-    def detect_emotion(self, text: str, min_length: int = 5) -> Dict:
+    def _cuda_available(self) -> bool:
+        """Check whether a CUDA device can be used for inference."""
+        try:
+            import torch
+            return torch.cuda.is_available()
+        except Exception:
+            return False
+
+    def _load_cpu_model(self):
+        """Load the int8-quantized PyTorch model for CPU inference."""
+        from transformers import AutoModelForSequenceClassification
+
+        model = AutoModelForSequenceClassification.from_pretrained(EMOTION_MODEL).eval()
+        if IPEX_AVAILABLE and self._cpu_bf16_supported():
+            optimized = self._optimize_bf16(model)
+            if optimized is not None:
+                return optimized
+        return self._quantize_model(model)
+
+    def _cpu_bf16_supported(self) -> bool:
+        """Check whether the CPU has native bfloat16 matmul (AVX-512-BF16/AMX)."""
+        try:
+            import torch
+            return torch.ops.mkldnn._is_mkldnn_bf16_supported()
+        except Exception:
+            return False
+
+    def _optimize_bf16(self, model):
+        """Optimize the model for bfloat16 CPU inference with IPEX."""
+        try:
+            import intel_extension_for_pytorch as ipex
+            import torch
+            optimized = ipex.optimize(model, dtype=torch.bfloat16)
+            self._bf16 = True
+            logger.info("Emotion model optimized with IPEX (bfloat16)")
+            return optimized
+        except Exception as e:
+            logger.warning(f"IPEX bfloat16 optimization unavailable, using int8: {e}")
+            return None
+
+    def _load_gpu_model(self):
+        """Load the model in float16 on GPU with SDPA attention, or None if that fails."""
+        try:
+            import torch
+            from transformers import AutoModelForSequenceClassification
+
+            try:
+                model = AutoModelForSequenceClassification.from_pretrained(
+                    EMOTION_MODEL, torch_dtype=torch.float16, attn_implementation="sdpa"
+                )
+            except (TypeError, ValueError) as e:
+                # Older transformers releases lack SDPA support for this model
+                message = str(e)
+                if not any(s in message for s in ("attn_implementation", "sdpa", "scaled_dot_product")):
+                    raise
+                logger.info(f"SDPA attention unavailable, using default attention: {e}")
+                model = AutoModelForSequenceClassification.from_pretrained(
+                    EMOTION_MODEL, torch_dtype=torch.float16
+                )
+
+            # A single small model, so it is moved whole rather than sharded
+            model = model.to("cuda").eval()
+            logger.info("Emotion model placed on GPU (float16)")
+            return model
+        except Exception as e:
+            logger.warning(f"GPU emotion model unavailable, falling back to CPU: {e}")
+            return None
+
+    def _load_onnx_model(self):
+        """Load the int8 ONNX Runtime model, exporting it on first run."""
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+            if not os.path.exists(os.path.join(ONNX_CACHE_DIR, ONNX_MODEL_FILE)):
+                logger.info(f"Exporting int8 ONNX emotion model to {ONNX_CACHE_DIR}")
+                fp32_model = ORTModelForSequenceClassification.from_pretrained(EMOTION_MODEL, export=True)
+                fp32_model.save_pretrained(ONNX_CACHE_DIR)
+                quantizer = ORTQuantizer.from_pretrained(fp32_model)
+                quantizer.quantize(
+                    save_dir=ONNX_CACHE_DIR,
+                    quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False)
+                )
+
+            model = ORTModelForSequenceClassification.from_pretrained(
+                ONNX_CACHE_DIR, file_name=ONNX_MODEL_FILE, provider="CPUExecutionProvider"
+            )
+            logger.info("Emotion model running on ONNX Runtime (int8)")
+            return model
+        except Exception as e:
+            logger.warning(f"ONNX Runtime emotion model unavailable, using PyTorch: {e}")
+            return None
+
+    def _quantize_model(self, model):
+        """Quantize linear layers to int8 for faster CPU inference."""
+        try:
+            import torch
+            quantized = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            logger.info("Emotion model quantized to int8")
+            return quantized
+        except Exception as e:
+            logger.warning(f"Int8 quantization unavailable, using full precision: {e}")
+            return model
+
+    def detect_emotion(self, text: str, min_length: int = MIN_TEXT_LENGTH) -> EmotionResult:
         """
         Detect emotion in text with confidence scores.
 
@@ -48,35 +227,124 @@ class EmotionDetector:
             dict: Contains top emotion label and all scores
         """
         if not text or len(text.strip()) < min_length:
-            return {
-                "label": "neutral",
-                "confidence": 0.5,
-                "all_scores": [{"label": "neutral", "score": 0.5}]
-            }
+            return self._default_result()
 
         try:
-            # Truncate very long text to avoid memory issues
-            text = text[:512] if len(text) > 512 else text
+            return self.classify(text)
+
+        except Exception as e:
+            logger.error(f"Emotion detection failed: {e}")
+            return self._default_result()
+
+    def classify(self, text: str) -> EmotionResult:
+        """
+        Classify one text through the micro-batch worker.
+
+        Unlike detect_emotion, model errors and timeouts are raised rather
+        than turned into the default result.
+
+        Args:
+            text (str): Input text to analyze
 
-            results = self._pipeline(text, truncation=True)
-            if not results:
-                return self._default_result()
+        Returns:
+            dict: Contains top emotion label and all scores
+        """
+        return self._format_result(self.score_text(text))
 
-            # Sort by confidence score
-            sorted_results = sorted(results[0], key=lambda x: x["score"], reverse=True)
-            top_result = sorted_results[0]
+    def score_text(self, text: str) -> Tuple[float, ...]:
+        """Return one text's label probabilities, raising on model errors or timeouts."""
+        # Hand the text to the batch worker and wait for its row
+        future = Future()
+        self._queue.put((text, future))
+        return future.result(timeout=RESULT_TIMEOUT)
 
-            return {
-                "label": top_result["label"],
-                "confidence": round(top_result["score"], 3),
-                "all_scores": [{"label": r["label"], "score": round(r["score"], 3)} for r in sorted_results]
-            }
+    def detect_emotions_batch(self, texts: List[str], min_length: int = MIN_TEXT_LENGTH) -> List[EmotionResult]:
+        """
+        Detect emotions for many texts with one padded forward pass per chunk.
 
+        Args:
+            texts (list): Input texts to analyze
+            min_length (int): Minimum text length for analysis
+
+        Returns:
+            list: Emotion results, in input order
+        """
+        results = [self._default_result() for _ in texts]
+        pending = [i for i, text in enumerate(texts) if text and len(text.strip()) >= min_length]
+
+        try:
+            for start in range(0, len(pending), DIRECT_BATCH_SIZE):
+                chunk = pending[start:start + DIRECT_BATCH_SIZE]
+                for i, scores in zip(chunk, self._score([texts[i] for i in chunk])):
+                    results[i] = self._format_result(scores)
         except Exception as e:
-            logger.error(f"Emotion detection failed: {e}")
+            logger.error(f"Batch emotion detection failed: {e}")
+
+        return results
+
+    def _start_batch_worker(self):
+        """Start the micro-batching worker thread once per process."""
+        with self._worker_lock:
+            if self._queue is None:
+                self._queue = queue.Queue()
+                threading.Thread(
+                    target=self._batch_worker, name="emotion-batcher", daemon=True
+                ).start()
+
+    def _batch_worker(self):
+        """Coalesce queued texts into padded batches and resolve their futures."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + BATCH_WAIT
+
+            while len(batch) < MAX_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                for (_, future), scores in zip(batch, self._score(texts)):
+                    future.set_result(tuple(scores))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _score(self, texts: List[str]) -> List[List[float]]:
+        """Run one padded forward pass and return per-text label probabilities."""
+        import torch
+
+        inputs = self._tokenizer(
+            texts, padding=True, truncation=True, max_length=MAX_INPUT_TOKENS, return_tensors="pt"
+        ).to(self._model.device)
+        autocast = torch.autocast("cpu", dtype=torch.bfloat16) if self._bf16 else contextlib.nullcontext()
+        with torch.inference_mode(), autocast:
+            logits = self._model(**inputs).logits
+        return torch.softmax(logits.float(), dim=-1).tolist()
+
+    def _format_result(self, scores: Sequence[float]) -> EmotionResult:
+        """Build the emotion result dict, ranking every label, from one row of probabilities."""
+        if not scores:
             return self._default_result()
 
-    def _default_result(self) -> Dict:
+        order = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+        return {
+            "label": self._labels[order[0]],
+            "confidence": round(scores[order[0]], 3),
+            "all_scores": [{"label": self._labels[i], "score": round(scores[i], 3)} for i in order]
+        }
+
+    def _top_emotion(self, scores: Sequence[float]) -> Tuple[str, float]:
+        """Return the top label and its confidence without ranking the rest."""
+        top = max(range(len(scores)), key=scores.__getitem__)
+        return self._labels[top], round(scores[top], 3)
+
+    def _default_result(self) -> EmotionResult:
         """Return default emotion result for error cases."""
         return {
             "label": "neutral",
@@ -84,17 +352,20 @@ class EmotionDetector:
             "all_scores": [{"label": "neutral", "score": 0.5}]
         }
 
-# Create global detector instance
+# Global detector instance
 _detector = None
+_detector_lock = threading.Lock()
 
 def get_detector() -> EmotionDetector:
-    """Get or create the global emotion detector instance."""
+    """Get or create the process-wide emotion detector instance."""
     global _detector
     if _detector is None:
-        _detector = EmotionDetector()
+        with _detector_lock:
+            if _detector is None:
+                _detector = EmotionDetector()
     return _detector
 
-def detect_emotion(text: str) -> Dict:
+def detect_emotion(text: str) -> EmotionResult:
     """
     Convenient function to detect emotion in text.
 
@@ -105,4 +376,76 @@ def detect_emotion(text: str) -> Dict:
         dict: Emotion analysis results
     """
     detector = get_detector()
-    return detector.detect_emotion(text)
+    scores = _emotion_scores(text)
+    if scores is None:
+        return detector._default_result()
+    return detector._format_result(scores)
+
+def _emotion_scores(text: str) -> Optional[Tuple[float, ...]]:
+    """Return cached label probabilities, or None for short text or a model failure."""
+    text = text.strip() if text else text
+    if not text or len(text) < MIN_TEXT_LENGTH:
+        return None
+
+    try:
+        return _emotion_scores_cached(text)
+    except Exception as e:
+        # Failures are not cached, so the next call retries the model
+        logger.error(f"Emotion detection failed: {e}")
+        return None
+
+@functools.lru_cache(maxsize=EMOTION_CACHE_SIZE)
+def _emotion_scores_cached(text: str) -> Tuple[float, ...]:
+    """Run the detector once per distinct normalized text."""
+    detector = get_detector()
+    return detector.score_text(text)
+
+def detect_emotion_batch(texts: List[str]) -> List[EmotionResult]:
+    """
+    Detect emotions for many texts at once, bypassing the per-text cache.
+
+    Args:
+        texts (list): Texts to analyze
+
+    Returns:
+        list: Emotion analysis results, in input order
+    """
+    detector = get_detector()
+    return detector.detect_emotions_batch([text.strip() if text else text for text in texts])
+
+def detect_emotion_and_sentiment(text: str) -> Tuple[str, float, str]:
+    """
+    Detect emotion and fuse it with sentiment for the same text.
+
+    When the emotion model is confident, the sentiment models are skipped
+    and the sentiment is taken from the emotion's polarity instead.
+
+    Args:
+        text (str): Text to analyze
+
+    Returns:
+        tuple: (emotion_label, confidence, fused_emotion)
+    """
+    # Only the top label is needed, so the full ranking is never built
+    detector = get_detector()
+    scores = _emotion_scores(text)
+    if scores is None:
+        emotion_label, confidence = "neutral", 0.5
+    else:
+        emotion_label, confidence = detector._top_emotion(scores)
+    polarity = EMOTION_POLARITY.get(emotion_label, "neutral")
+
+    if confidence >= FUSION_SKIP_CONFIDENCE:
+        return emotion_label, confidence, combine_labels(polarity, emotion_label)
+
+    try:
+        base_sentiment = get_fusion().analyze_sentiment(text)["combined_label"]
+    except Exception as e:
+        logger.error(f"Sentiment fusion failed: {e}")
+        base_sentiment = "neutral"
+
+    logger.debug(
+        f"Sentiment fusion {'overrode' if base_sentiment != polarity else 'matched'} "
+        f"{emotion_label} polarity ({polarity} -> {base_sentiment}, confidence {confidence})"
+    )
+    return emotion_label, confidence, combine_labels(base_sentiment, emotion_label)
@@ -5,23 +5,54 @@ Handles API calls, rate limiting, and error recovery.
 
 import os
 import logging
+import re
+import threading
 import time
-from typing import Optional, Dict
+from typing import Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
 try:
     import google.generativeai as genai
 except ImportError:
     genai = None
-    logging.warning("google-generativeai not installed. LLM responses will use fallback.")
-
-logger = logging.getLogger(__name__)
+    logger.warning("google-generativeai not installed. LLM responses will use fallback.")
+
+# Fallback keyword categories in priority order, with their responses
+_FALLBACK_CATEGORIES = (
+    (("sad", "depressed", "down", "upset"),
+     "I understand you're going through a tough time. It's okay to feel sad sometimes - these feelings are valid and temporary. Would you like to talk more about what's bothering you? 💙"),
+    (("angry", "frustrated", "mad", "annoyed"),
+     "It sounds like you're feeling frustrated right now. That's completely understandable. Take a deep breath with me. Sometimes talking through what's making us angry can help. I'm here to listen. 🫂"),
+    (("anxious", "worried", "nervous", "stressed"),
+     "I can sense you're feeling anxious. Anxiety can be overwhelming, but you're not alone in this. Try taking some slow, deep breaths. What's one thing that usually helps you feel calmer? 🌸"),
+    (("happy", "excited", "joyful", "great", "wonderful"),
+     "I'm so glad to hear you're feeling positive! It's wonderful when we experience joy. What's been the highlight of your day? I'd love to celebrate this moment with you! ✨"),
+    (("tired", "exhausted", "drained", "overwhelmed"),
+     "You sound really tired right now. It's important to acknowledge when we need rest. Have you been taking care of yourself lately? Sometimes we need to slow down and recharge. 🌙"),
+)
+_FALLBACK_DEFAULT = "Thank you for sharing with me. I'm here to listen and support you through whatever you're experiencing. Your feelings matter, and you're not alone. How can I help you today? 🤗"
+_FALLBACK_TEXTS = frozenset(response for _, response in _FALLBACK_CATEGORIES) | {_FALLBACK_DEFAULT}
+
+# One case-insensitive whole-word pattern per category, checked in priority order
+_FALLBACK_PATTERNS = tuple(
+    (re.compile(r"\b(?:" + "|".join(map(re.escape, keywords)) + r")\b", re.I), response)
+    for keywords, response in _FALLBACK_CATEGORIES
+)
 
 class GeminiClient:
     """Handles Gemini API interactions with error handling and rate limiting."""
 
     def __init__(self):
         self.model = None
-        self.last_request_time = 0
-        self.min_request_interval = 1.0  # Minimum seconds between requests
+
+        # Token bucket: sustained `rate` requests/second, bursts up to `capacity`
+        self.rate = 1.0
+        self.capacity = 3
+        self.tokens = float(self.capacity)
+        self.last_refill = time.monotonic()
+        self._rate_lock = threading.Lock()
+
         self._initialize_client()
 
     def _initialize_client(self):
@@ -41,7 +72,10 @@ class GeminiClient:
                     pass
 
             if api_key:
-                genai.configure(api_key=api_key)
+                # gRPC keeps one persistent HTTP/2 channel that every call
+                # multiplexes over; "rest" opens plain HTTPS connections
+                transport = os.getenv("GEMINI_TRANSPORT", "grpc")
+                genai.configure(api_key=api_key, transport=transport)
                 self.model = genai.GenerativeModel("gemini-1.5-flash")
                 logger.info("Gemini client initialized successfully")
             else:
@@ -54,6 +88,8 @@ class GeminiClient:
         """
         Generate response using Gemini API with retries and rate limiting.
 
+        Thin wrapper over stream_response for callers that want the full text.
+
         Args:
             prompt (str): The prompt to send to Gemini
             max_retries (int): Maximum retry attempts
@@ -62,77 +98,104 @@ class GeminiClient:
         Returns:
             str: Generated response or fallback message
         """
+        return "".join(
+            self.stream_response(prompt, max_retries=max_retries, temperature=temperature)
+        ).strip()
+
+    def stream_response(self, prompt: str, max_retries: int = 3,
+                        temperature: float = 0.7) -> Iterator[str]:
+        """
+        Stream response chunks from Gemini as they are generated.
+
+        Retries only while nothing has been yielded yet; once text has been
+        streamed a failure simply ends the stream.
+
+        Args:
+            prompt (str): The prompt to send to Gemini
+            max_retries (int): Maximum retry attempts
+            temperature (float): Response creativity (0.0-1.0)
+
+        Yields:
+            str: Response text chunks, or the fallback message as one chunk
+        """
         if not self.model:
-            return self._fallback_response(prompt)
+            yield self._fallback_response(prompt)
+            return
 
         # Rate limiting
         self._enforce_rate_limit()
 
         for attempt in range(max_retries):
+            streamed = False
             try:
                 response = self.model.generate_content(
                     prompt,
-                    generation_config={
-                        "temperature": temperature,
-                        "max_output_tokens": 500,
-                        "top_p": 0.9
-                    }
+                    generation_config=self._generation_config(temperature),
+                    stream=True
                 )
 
-                if response and response.text:
-                    return response.text.strip()
-                else:
-                    logger.warning(f"Empty response from Gemini (attempt {attempt + 1})")
+                for chunk in response:
+                    if chunk.text:
+                        streamed = True
+                        yield chunk.text
+
+                if streamed:
+                    return
+                logger.warning(f"Empty streamed response from Gemini (attempt {attempt + 1})")
 
             except Exception as e:
-                logger.error(f"Gemini API error (attempt {attempt + 1}): {e}")
+                logger.error(f"Gemini streaming error (attempt {attempt + 1}): {e}")
+                if streamed:
+                    return
                 if attempt < max_retries - 1:
                     time.sleep(2 ** attempt)  # Exponential backoff
 
-        return self._fallback_response(prompt)
+        yield self._fallback_response(prompt)
+
+    def _generation_config(self, temperature: float) -> Dict:
+        """Build the generation config for Gemini calls."""
+        return {
+            "temperature": temperature,
+            "max_output_tokens": 500,
+            "top_p": 0.9
+        }
 
     def _enforce_rate_limit(self):
-        """Enforce rate limiting between API calls."""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
+        """Take a token from the bucket, sleeping only when it is empty."""
+        while True:
+            with self._rate_lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
 
-        if time_since_last < self.min_request_interval:
-            sleep_time = self.min_request_interval - time_since_last
-            time.sleep(sleep_time)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
 
-        self.last_request_time = time.time()
+                wait_time = (1 - self.tokens) / self.rate
+
+            # Sleep outside the lock so other callers can refill/consume
+            time.sleep(wait_time)
 
     def _fallback_response(self, prompt: str) -> str:
         """Generate fallback response when Gemini is unavailable."""
         # Simple keyword-based fallback responses
-        text_lower = prompt.lower()
-
-        if any(word in text_lower for word in ["sad", "depressed", "down", "upset"]):
-            return "I understand you're going through a tough time. It's okay to feel sad sometimes - these feelings are valid and temporary. Would you like to talk more about what's bothering you? 💙"
-
-        elif any(word in text_lower for word in ["angry", "frustrated", "mad", "annoyed"]):
-            return "It sounds like you're feeling frustrated right now. That's completely understandable. Take a deep breath with me. Sometimes talking through what's making us angry can help. I'm here to listen. 🫂"
-
-        elif any(word in text_lower for word in ["anxious", "worried", "nervous", "stressed"]):
-            return "I can sense you're feeling anxious. Anxiety can be overwhelming, but you're not alone in this. Try taking some slow, deep breaths. What's one thing that usually helps you feel calmer? 🌸"
-
-        elif any(word in text_lower for word in ["happy", "excited", "joyful", "great", "wonderful"]):
-            return "I'm so glad to hear you're feeling positive! It's wonderful when we experience joy. What's been the highlight of your day? I'd love to celebrate this moment with you! ✨"
-
-        elif any(word in text_lower for word in ["tired", "exhausted", "drained", "overwhelmed"]):
-            return "You sound really tired right now. It's important to acknowledge when we need rest. Have you been taking care of yourself lately? Sometimes we need to slow down and recharge. 🌙"
-
-        else:
-            return "Thank you for sharing with me. I'm here to listen and support you through whatever you're experiencing. Your feelings matter, and you're not alone. How can I help you today? 🤗"
+        for pattern, response in _FALLBACK_PATTERNS:
+            if pattern.search(prompt):
+                return response
+        return _FALLBACK_DEFAULT
 
 # Global client instance
 _client = None
+_client_lock = threading.Lock()
 
 def get_client() -> GeminiClient:
-    """Get or create global Gemini client."""
+    """Get or create the process-wide Gemini client."""
     global _client
     if _client is None:
-        _client = GeminiClient()
+        with _client_lock:
+            if _client is None:
+                _client = GeminiClient()
     return _client
 
 def ask_gemini(prompt: str, temperature: float = 0.7) -> str:
@@ -149,6 +212,24 @@ def ask_gemini(prompt: str, temperature: float = 0.7) -> str:
     client = get_client()
     return client.generate_response(prompt, temperature=temperature)
 
+def ask_gemini_stream(prompt: str, temperature: float = 0.7) -> Iterator[str]:
+    """
+    Convenient function to stream a Gemini response.
+
+    Args:
+        prompt (str): Prompt to send
+        temperature (float): Response creativity
+
+    Yields:
+        str: Response text chunks
+    """
+    client = get_client()
+    yield from client.stream_response(prompt, temperature=temperature)
+
+def is_fallback_response(response: str) -> bool:
+    """Check whether a response is one of the canned offline replies."""
+    return response in _FALLBACK_TEXTS
+
 def check_api_health() -> Dict[str, bool]:
     """Check if Gemini API is available and working."""
     client = get_client()
@@ -158,7 +239,7 @@ def check_api_health() -> Dict[str, bool]:
 
     try:
         test_response = client.generate_response("Hello", max_retries=1)
-        is_working = len(test_response) > 0 and "fallback" not in test_response.lower()
+        is_working = len(test_response) > 0 and not is_fallback_response(test_response)
 
         return {
             "available": is_working,
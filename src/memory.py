@@ -4,54 +4,199 @@ Handles user emotion history, conversation context, and analytics.
 """
 
 import os
+import atexit
+import contextlib
+import functools
+import heapq
+import operator
+import queue
 import sqlite3
 import datetime
+import importlib.util
 import logging
-from typing import List, Dict, Optional, Union
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Iterator, List, Dict, Optional, Union
 import json
 
 logger = logging.getLogger(__name__)
 
-# Optional Google Sheets support
-try:
-    import gspread
-    from oauth2client.service_account import ServiceAccountCredentials
-    SHEETS_AVAILABLE = True
-except ImportError:
-    SHEETS_AVAILABLE = False
+# Optional Google Sheets support, imported only when the Sheets backend is used
+SHEETS_AVAILABLE = all(
+    importlib.util.find_spec(name) is not None for name in ("gspread", "oauth2client")
+)
+if not SHEETS_AVAILABLE:
     logger.info("Google Sheets not available - using SQLite only")
 
+# WAL lets readers run alongside the writer and fsyncs only at checkpoints
+_SQLITE_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-20000;
+    PRAGMA mmap_size=268435456;
+"""
+
+# Overridable with EMPATHYAI_DB_PATH; "file:" URIs are opened in URI mode, e.g.
+# "file:empathy?mode=memory&cache=shared" for a shared in-memory database
+SQLITE_DB_PATH = "empathy_memory.db"
+SCHEMA_VERSION = 1  # 1: emotions.confidence stored as an integer percentage
+
+# Database paths whose tables and migrations have been applied in this process
+_SCHEMA_READY = set()
+
+def _to_percent(confidence: Optional[float]) -> int:
+    """Quantize a 0-1 confidence to the stored integer percentage."""
+    return round((confidence or 0.5) * 100)
+
+# Idle connections per database file. LIFO hands out the most recently used
+# connection, whose page cache is warmest.
+_POOL: Dict[str, "queue.LifoQueue[sqlite3.Connection]"] = {}
+_pool_lock = threading.Lock()
+
+def _new_connection(db_path: str) -> sqlite3.Connection:
+    """Open a connection in WAL mode with performance pragmas."""
+    conn = sqlite3.connect(db_path, check_same_thread=False, uri=db_path.startswith("file:"))
+    conn.executescript(_SQLITE_PRAGMAS)
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    # In-memory databases have no WAL and report "memory"
+    if journal_mode.lower() not in ("wal", "memory"):
+        logger.warning(f"SQLite WAL mode unavailable, using {journal_mode} journal")
+    return conn
+
+@contextlib.contextmanager
+def get_conn(db_path: str) -> Iterator[sqlite3.Connection]:
+    """Borrow a pooled connection for db_path, returning it afterwards."""
+    with _pool_lock:
+        pool = _POOL.setdefault(db_path, queue.LifoQueue())
+
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _new_connection(db_path)
+
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        pool.put(conn)
+
+def _close_pool():
+    """Close every idle pooled connection (checkpointing the WAL)."""
+    with _pool_lock:
+        pools = list(_POOL.values())
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+atexit.register(_close_pool)
+
+# Write-behind buffering: rows are written in one transaction once this many
+# are pending or the oldest has waited this long (a timer flushes idle buffers)
+MEMORY_FLUSH_SIZE = 8
+MEMORY_FLUSH_INTERVAL = 2.0  # seconds
+
+_EMOTION_INSERT = """INSERT INTO emotions 
+    (user_id, timestamp, emotion_label, confidence, 
+     message_text, response_text, session_id) 
+    VALUES (?, ?, ?, ?, ?, ?, ?)"""
+_CONTEXT_INSERT = """INSERT INTO conversation_context 
+    (user_id, session_id, message_pair, timestamp) 
+    VALUES (?, ?, ?, ?)"""
+
+# Managers that may hold unwritten rows; flushed at exit (before the pool closes)
+_buffered_managers = weakref.WeakSet()
+
+def _flush_all():
+    """Write every manager's pending rows."""
+    for manager in list(_buffered_managers):
+        manager.flush()
+
+atexit.register(_flush_all)
+
+# Google Sheets keeps one worksheet per user; its rows are cached so reads
+# stay under the API quota
+SHEETS_CACHE_TTL = 60  # seconds
+_SHEETS_COLUMNS = ("timestamp", "user_id", "emotion_label", "confidence",
+                   "message_text", "response_text", "session_id")
+_sheet_rows_cache: Dict[str, tuple] = {}
+_sheet_rows_lock = threading.Lock()
+
+def _sheet_record(row: list) -> Dict:
+    """Build a record dict from one raw worksheet row."""
+    timestamp, _, emotion, confidence, message, response, session_id = row[:len(_SHEETS_COLUMNS)]
+    return {
+        "timestamp": timestamp,
+        "emotion": emotion,
+        "confidence": float(confidence or 0.5),
+        "message": message or "",
+        "response": response or "",
+        "session_id": session_id or ""
+    }
+
+@functools.lru_cache(maxsize=1)
+def _sheets_enabled() -> bool:
+    """Determine once per process whether to use Google Sheets."""
+    try:
+        # Check environment variable
+        if os.getenv("USE_SHEETS", "").lower() == "true":
+            return True
+
+        # Check streamlit secrets
+        import streamlit as st
+        return bool(st.secrets.get("USE_SHEETS", False))
+    except:
+        return False
+
+@functools.lru_cache(maxsize=1)
+def _sheets_credentials():
+    """Load the Google Sheets service account credentials once per process."""
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    scope = ["https://www.googleapis.com/auth/spreadsheets"]
+    credentials_path = os.getenv("GOOGLE_SHEETS_CREDENTIALS", "gcp_service_account.json")
+    if os.path.exists(credentials_path):
+        return ServiceAccountCredentials.from_json_keyfile_name(credentials_path, scope)
+
+    # Try streamlit secrets for credentials
+    try:
+        import streamlit as st
+        creds_dict = dict(st.secrets["google_sheets_credentials"])
+    except:
+        raise Exception("Google Sheets credentials not found")
+    return ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+
 class MemoryManager:
     """Manages user memory using SQLite or Google Sheets backend."""
 
     def __init__(self, user_id: str):
         self.user_id = user_id
-        self.use_sheets = self._should_use_sheets()
+        self.use_sheets = _sheets_enabled() and SHEETS_AVAILABLE
 
-        if self.use_sheets and SHEETS_AVAILABLE:
+        if self.use_sheets:
             self._init_sheets()
         else:
             self._init_sqlite()
 
-    def _should_use_sheets(self) -> bool:
-        """Determine whether to use Google Sheets based on environment."""
-        try:
-            # Check environment variable
-            if os.getenv("USE_SHEETS", "").lower() == "true":
-                return True
-
-            # Check streamlit secrets
-            import streamlit as st
-            return st.secrets.get("USE_SHEETS", False)
-        except:
-            return False
-
     def _init_sqlite(self):
         """Initialize SQLite database."""
         try:
-            self.db_path = "empathy_memory.db"
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self._create_tables()
+            self.db_path = os.getenv("EMPATHYAI_DB_PATH", SQLITE_DB_PATH)
+            self._pending_emotions = []
+            self._pending_context = []
+            self._pending_since = None
+            self._pending_lock = threading.Lock()
+            if self.db_path not in _SCHEMA_READY:
+                with get_conn(self.db_path) as conn:
+                    self._create_tables(conn)
+                _SCHEMA_READY.add(self.db_path)
+            _buffered_managers.add(self)
             logger.info(f"SQLite memory initialized for user: {self.user_id}")
         except Exception as e:
             logger.error(f"SQLite initialization failed: {e}")
@@ -60,25 +205,9 @@ class MemoryManager:
     def _init_sheets(self):
         """Initialize Google Sheets connection."""
         try:
-            credentials_path = os.getenv("GOOGLE_SHEETS_CREDENTIALS", "gcp_service_account.json")
-
-            # Try streamlit secrets for credentials
-            if not os.path.exists(credentials_path):
-                try:
-                    import streamlit as st
-                    creds_dict = st.secrets["google_sheets_credentials"]
-
-                    # Save to temp file
-                    import tempfile
-                    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json') as f:
-                        json.dump(dict(creds_dict), f)
-                        credentials_path = f.name
-                except:
-                    raise Exception("Google Sheets credentials not found")
-
-            scope = ["https://www.googleapis.com/auth/spreadsheets"]
-            creds = ServiceAccountCredentials.from_json_keyfile_name(credentials_path, scope)
-            self.gc = gspread.authorize(creds)
+            import gspread
+
+            self.gc = gspread.authorize(_sheets_credentials())
 
             sheet_name = os.getenv("SHEET_NAME", "EmpathyAI_Memory")
             try:
@@ -88,7 +217,12 @@ class MemoryManager:
             except:
                 pass
 
-            self.sheet = self.gc.open(sheet_name).worksheet("emotions")
+            spreadsheet = self.gc.open(sheet_name)
+            try:
+                self.sheet = spreadsheet.worksheet(self.user_id)
+            except gspread.WorksheetNotFound:
+                self.sheet = self._create_user_worksheet(spreadsheet)
+            self._sheet_key = f"{spreadsheet.id}/{self.sheet.id}"
             logger.info(f"Google Sheets memory initialized for user: {self.user_id}")
 
         except Exception as e:
@@ -97,7 +231,28 @@ class MemoryManager:
             self.use_sheets = False
             self._init_sqlite()
 
-    def _create_tables(self):
+    def _create_user_worksheet(self, spreadsheet):
+        """Create this user's worksheet, carrying over rows from the shared sheet."""
+        worksheet = spreadsheet.add_worksheet(
+            title=self.user_id, rows=1000, cols=len(_SHEETS_COLUMNS)
+        )
+        worksheet.append_row(list(_SHEETS_COLUMNS))
+
+        try:
+            legacy_rows = [
+                [record.get(column, "") for column in _SHEETS_COLUMNS]
+                for record in spreadsheet.worksheet("emotions").get_all_records()
+                if record.get("user_id") == self.user_id
+            ]
+            if legacy_rows:
+                worksheet.append_rows(legacy_rows)
+        except Exception as e:
+            logger.warning(f"Could not migrate shared emotion rows: {e}")
+
+        logger.info(f"Created Google Sheets worksheet for user: {self.user_id}")
+        return worksheet
+
+    def _create_tables(self, conn: sqlite3.Connection):
         """Create necessary SQLite tables."""
         # Create emotions table
         emotions_table = """CREATE TABLE IF NOT EXISTS emotions (
@@ -105,7 +260,7 @@ class MemoryManager:
             user_id TEXT NOT NULL,
             timestamp TEXT NOT NULL,
             emotion_label TEXT NOT NULL,
-            confidence REAL,
+            confidence INTEGER,  -- percent, 0-100
             message_text TEXT,
             response_text TEXT,
             session_id TEXT
@@ -133,9 +288,35 @@ class MemoryManager:
 
         tables = [emotions_table, profiles_table, context_table]
 
-        for table_sql in tables:
-            self.conn.execute(table_sql)
-        self.conn.commit()
+        # Indexes matching the per-user, newest-first queries
+        indexes = [
+            "CREATE INDEX IF NOT EXISTS idx_emotions_user_ts ON emotions(user_id, timestamp DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_context_user_session_ts "
+            "ON conversation_context(user_id, session_id, timestamp DESC)",
+        ]
+
+        # One script, one round of statement preparation
+        conn.executescript(";\n".join(tables + indexes) + ";")
+
+        self._migrate_schema(conn)
+
+    def _migrate_schema(self, conn: sqlite3.Connection):
+        """Bring an existing database up to SCHEMA_VERSION."""
+        # IMMEDIATE takes the write lock first, so concurrent inits can't both migrate
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                # Confidence moved from a 0-1 float to an integer percentage
+                conn.execute("""UPDATE emotions
+                    SET confidence = CAST(ROUND(confidence * 100) AS INTEGER)
+                    WHERE confidence IS NOT NULL""")
+            if version < SCHEMA_VERSION:
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
     def add_emotion_record(self, emotion_label: str, confidence: float = None, 
                           message: str = None, response: str = None, 
@@ -163,6 +344,12 @@ class MemoryManager:
                 message or "", response or "", session_id or ""
             ]
             self.sheet.append_row(row)
+
+            # Write through so cached reads see the new row before the TTL expires
+            with _sheet_rows_lock:
+                cached = _sheet_rows_cache.get(self._sheet_key)
+                if cached is not None:
+                    cached[1].append(row)
             return True
         except Exception as e:
             logger.error(f"Failed to add to sheets: {e}")
@@ -172,20 +359,141 @@ class MemoryManager:
                       message: str, response: str, session_id: str) -> bool:
         """Add record to SQLite."""
         try:
-            insert_query = """INSERT INTO emotions 
-                (user_id, timestamp, emotion_label, confidence, 
-                 message_text, response_text, session_id) 
-                VALUES (?, ?, ?, ?, ?, ?, ?)"""
-
-            self.conn.execute(insert_query, 
-                (self.user_id, timestamp, emotion, confidence or 0.5,
-                 message, response, session_id))
-            self.conn.commit()
-            return True
+            return self._buffer_rows(
+                emotion_row=(self.user_id, timestamp, emotion, _to_percent(confidence),
+                             message, response, session_id)
+            )
         except Exception as e:
             logger.error(f"Failed to add to SQLite: {e}")
             return False
 
+    def add_conversation_context(self, user_message: str, ai_response: str,
+                                 session_id: str = None) -> bool:
+        """Add a user/AI message pair to the conversation context."""
+        try:
+            if self.use_sheets:
+                # Sheets rows already carry the message and response text
+                return True
+
+            timestamp = datetime.datetime.utcnow().isoformat()
+            message_pair = json.dumps({"user": user_message, "ai": ai_response})
+
+            return self._buffer_rows(
+                context_row=(self.user_id, session_id or "", message_pair, timestamp)
+            )
+        except Exception as e:
+            logger.error(f"Failed to add conversation context: {e}")
+            return False
+
+    def add_turn(self, user_message: str, ai_response: str, emotion_label: str,
+                 confidence: float = None, session_id: str = None) -> bool:
+        """Store a full conversation turn (emotion record + context) in one write."""
+        try:
+            timestamp = datetime.datetime.utcnow().isoformat()
+
+            if self.use_sheets:
+                # The emotion row already carries the message and response
+                return self._add_to_sheets(timestamp, emotion_label, confidence,
+                                           user_message, ai_response, session_id)
+
+            message_pair = json.dumps({"user": user_message, "ai": ai_response})
+
+            # Both rows are written in the same flush transaction
+            return self._buffer_rows(
+                emotion_row=(self.user_id, timestamp, emotion_label, _to_percent(confidence),
+                             user_message, ai_response, session_id),
+                context_row=(self.user_id, session_id or "", message_pair, timestamp)
+            )
+        except Exception as e:
+            logger.error(f"Failed to add conversation turn: {e}")
+            return False
+
+    def _buffer_rows(self, emotion_row: tuple = None, context_row: tuple = None) -> bool:
+        """Queue rows for the next flush, flushing when the buffer is due."""
+        with self._pending_lock:
+            if emotion_row:
+                self._pending_emotions.append(emotion_row)
+            if context_row:
+                self._pending_context.append(context_row)
+            schedule = self._pending_since is None
+            if schedule:
+                self._pending_since = time.monotonic()
+
+            due = (
+                len(self._pending_emotions) + len(self._pending_context) >= MEMORY_FLUSH_SIZE
+                or time.monotonic() - self._pending_since >= MEMORY_FLUSH_INTERVAL
+            )
+
+        if due:
+            return self.flush()
+        if schedule:
+            self._schedule_flush()
+        return True
+
+    def _schedule_flush(self):
+        """Flush after MEMORY_FLUSH_INTERVAL even if no further write arrives."""
+        timer = threading.Timer(MEMORY_FLUSH_INTERVAL, self.flush)
+        timer.daemon = True
+        timer.start()
+
+    def flush(self) -> bool:
+        """Write all pending SQLite rows with executemany in one transaction."""
+        if self.use_sheets:
+            return True
+
+        with self._pending_lock:
+            emotions, contexts = self._pending_emotions, self._pending_context
+            if not emotions and not contexts:
+                return True
+            self._pending_emotions, self._pending_context = [], []
+            self._pending_since = None
+
+        try:
+            with get_conn(self.db_path) as conn, conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(_EMOTION_INSERT, emotions)
+                conn.executemany(_CONTEXT_INSERT, contexts)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to flush memory writes: {e}")
+            # Keep the rows for the next flush
+            with self._pending_lock:
+                self._pending_emotions[:0] = emotions
+                self._pending_context[:0] = contexts
+                schedule = self._pending_since is None
+                if schedule:
+                    self._pending_since = time.monotonic()
+            if schedule:
+                self._schedule_flush()
+            return False
+
+    def get_conversation_history(self, session_id: str, limit: int = 3) -> List[Dict]:
+        """Get the most recent message pairs for a session, oldest first."""
+        try:
+            if self.use_sheets:
+                records = [
+                    r for r in self._get_from_sheets(1000)
+                    if r["session_id"] == session_id
+                ][:limit]
+                return [
+                    {"user": r["message"], "ai": r.get("response", "")}
+                    for r in reversed(records)
+                ]
+
+            select_query = """SELECT message_pair
+                FROM conversation_context 
+                WHERE user_id = ? AND session_id = ? 
+                ORDER BY timestamp DESC 
+                LIMIT ?"""
+
+            self.flush()
+            with get_conn(self.db_path) as conn:
+                rows = conn.execute(select_query, (self.user_id, session_id, limit)).fetchall()
+            return [json.loads(row[0]) for row in reversed(rows)]
+        except Exception as e:
+            logger.error(f"Failed to get conversation history: {e}")
+            return []
+
     def get_recent_emotions(self, limit: int = 30) -> List[Dict]:
         """Get recent emotion records for the user."""
         try:
@@ -200,30 +508,34 @@ class MemoryManager:
     def _get_from_sheets(self, limit: int) -> List[Dict]:
         """Get records from Google Sheets."""
         try:
-            all_records = self.sheet.get_all_records()
-            user_records = [r for r in all_records if r.get("user_id") == self.user_id]
-
-            # Sort by timestamp (most recent first)
-            sorted_records = sorted(
-                user_records, 
-                key=lambda x: x.get("timestamp", ""), 
-                reverse=True
-            )[:limit]
-
-            return [
-                {
-                    "timestamp": r.get("timestamp"),
-                    "emotion": r.get("emotion_label"),
-                    "confidence": float(r.get("confidence", 0.5)),
-                    "message": r.get("message_text", ""),
-                    "session_id": r.get("session_id", "")
-                }
-                for r in sorted_records
-            ]
+            # The worksheet only holds this user's rows
+            rows = self._get_sheet_rows()
+
+            # Most recent first; a bounded heap avoids sorting every row
+            recent_rows = heapq.nlargest(limit, rows, key=operator.itemgetter(0))
+
+            return [_sheet_record(row) for row in recent_rows]
         except Exception as e:
             logger.error(f"Failed to get from sheets: {e}")
             return []
 
+    def _get_sheet_rows(self) -> List[list]:
+        """All worksheet data rows (columns A-G), fetched at most once per SHEETS_CACHE_TTL."""
+        with _sheet_rows_lock:
+            cached = _sheet_rows_cache.get(self._sheet_key)
+            if cached is not None and time.monotonic() - cached[0] < SHEETS_CACHE_TTL:
+                return list(cached[1])
+
+        # Raw values skip gspread's per-row dict building; row 1 is the header
+        rows = [
+            row + [""] * (len(_SHEETS_COLUMNS) - len(row))
+            for row in self.sheet.get_values("A2:G")
+            if row and row[0]
+        ]
+        with _sheet_rows_lock:
+            _sheet_rows_cache[self._sheet_key] = (time.monotonic(), rows)
+        return list(rows)
+
     def _get_from_sqlite(self, limit: int) -> List[Dict]:
         """Get records from SQLite."""
         try:
@@ -233,14 +545,16 @@ class MemoryManager:
                 ORDER BY timestamp DESC 
                 LIMIT ?"""
 
-            cursor = self.conn.execute(select_query, (self.user_id, limit))
+            self.flush()
+            with get_conn(self.db_path) as conn:
+                rows = conn.execute(select_query, (self.user_id, limit)).fetchall()
 
             records = []
-            for row in cursor.fetchall():
+            for row in rows:
                 records.append({
                     "timestamp": row[0],
                     "emotion": row[1],
-                    "confidence": row[2],
+                    "confidence": row[2] / 100 if row[2] is not None else 0.5,
                     "message": row[3] or "",
                     "session_id": row[4] or ""
                 })
@@ -255,56 +569,47 @@ class MemoryManager:
         try:
             cutoff_date = (datetime.datetime.utcnow() - datetime.timedelta(days=days)).isoformat()
 
+            # (emotion, count, total_confidence), most recently seen emotion first
             if self.use_sheets:
-                records = self._get_from_sheets(1000)  # Get more records for analysis
-                # Filter by date
-                recent_records = [
-                    r for r in records 
-                    if r["timestamp"] >= cutoff_date
-                ]
+                # Only timestamp, emotion and confidence are needed; rows are
+                # appended in time order, so walk them newest first and stop
+                # at the first row older than the cutoff
+                grouped = {}
+                for timestamp, _, emotion, confidence, *_ in reversed(self._get_sheet_rows()):
+                    if timestamp < cutoff_date:
+                        break
+                    count, total = grouped.get(emotion, (0, 0.0))
+                    grouped[emotion] = (count + 1, total + float(confidence or 0.5))
+                emotion_totals = [(emotion, count, total) for emotion, (count, total) in grouped.items()]
             else:
-                pattern_query = """SELECT emotion_label, confidence, timestamp
+                pattern_query = """SELECT emotion_label, COUNT(*), SUM(COALESCE(confidence, 50)) / 100.0
                     FROM emotions 
                     WHERE user_id = ? AND timestamp >= ?
-                    ORDER BY timestamp DESC"""
+                    GROUP BY emotion_label
+                    ORDER BY MAX(timestamp) DESC"""
 
-                cursor = self.conn.execute(pattern_query, (self.user_id, cutoff_date))
+                self.flush()
+                with get_conn(self.db_path) as conn:
+                    emotion_totals = conn.execute(pattern_query, (self.user_id, cutoff_date)).fetchall()
 
-                recent_records = [
-                    {"emotion": row[0], "confidence": row[1], "timestamp": row[2]}
-                    for row in cursor.fetchall()
-                ]
-
-            if not recent_records:
+            total_entries = sum(count for _, count, _ in emotion_totals)
+            if not total_entries:
                 return {"total_entries": 0, "patterns": {}}
 
-            # Analyze patterns
-            emotion_counts = {}
-            total_confidence = 0
-
-            for record in recent_records:
-                emotion = record["emotion"]
-                confidence = record.get("confidence", 0.5)
-
-                if emotion not in emotion_counts:
-                    emotion_counts[emotion] = {"count": 0, "total_confidence": 0}
-
-                emotion_counts[emotion]["count"] += 1
-                emotion_counts[emotion]["total_confidence"] += confidence
-                total_confidence += confidence
-
             # Calculate averages
-            patterns = {}
-            for emotion, data in emotion_counts.items():
-                patterns[emotion] = {
-                    "frequency": data["count"],
-                    "percentage": round((data["count"] / len(recent_records)) * 100, 1),
-                    "avg_confidence": round(data["total_confidence"] / data["count"], 2)
+            patterns = {
+                emotion: {
+                    "frequency": count,
+                    "percentage": round((count / total_entries) * 100, 1),
+                    "avg_confidence": round(total / count, 2)
                 }
+                for emotion, count, total in emotion_totals
+            }
+            total_confidence = sum(total for _, _, total in emotion_totals)
 
             return {
-                "total_entries": len(recent_records),
-                "avg_confidence": round(total_confidence / len(recent_records), 2),
+                "total_entries": total_entries,
+                "avg_confidence": round(total_confidence / total_entries, 2),
                 "patterns": patterns,
                 "time_period": f"{days} days"
             }
@@ -314,12 +619,31 @@ class MemoryManager:
             return {"total_entries": 0, "patterns": {}}
 
     def close(self):
-        """Close database connections."""
-        if hasattr(self, 'conn') and self.conn:
-            self.conn.close()
+        """Write pending rows; pooled SQLite connections stay open for reuse."""
+        self.flush()
+
 
+# Managers are reused across reruns and sessions, least recently used evicted
+MAX_CACHED_MANAGERS = 256
+_managers: "OrderedDict[str, MemoryManager]" = OrderedDict()
+_managers_lock = threading.Lock()
 
 # Factory function
 def create_memory_manager(user_id: str) -> MemoryManager:
-    """Create a memory manager for the given user."""
-    return MemoryManager(user_id)
+    """Get the memory manager for the given user, creating it on first use."""
+    with _managers_lock:
+        manager = _managers.get(user_id)
+        if manager is not None:
+            _managers.move_to_end(user_id)
+            return manager
+
+    manager = MemoryManager(user_id)
+    with _managers_lock:
+        # Another thread may have created one meanwhile; keep the first
+        manager = _managers.setdefault(user_id, manager)
+        _managers.move_to_end(user_id)
+        evicted = _managers.popitem(last=False)[1] if len(_managers) > MAX_CACHED_MANAGERS else None
+
+    if evicted is not None:
+        evicted.close()
+    return manager
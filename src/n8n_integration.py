@@ -4,39 +4,113 @@ Sends emotion data to n8n workflows for dashboard creation and alerting.
 """
 
 import os
+import atexit
+import functools
+import queue
+import threading
+import time
 import requests
 import logging
-from typing import Dict, Optional, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Optional, Any, Union
 import json
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Optional faster JSON encoder for webhook payloads
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _encode_payload(payload: Union[Dict[str, Any], List[Dict[str, Any]]]) -> bytes:
+    """Serialize a webhook payload to JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode("utf-8")
+
+def _config_value(name: str) -> Optional[str]:
+    """Read a setting from the environment, falling back to Streamlit secrets."""
+    value = os.getenv(name)
+
+    if not value:
+        try:
+            import streamlit as st
+            value = st.secrets.get(name)
+        except:
+            pass
+
+    return value
+
+@functools.lru_cache(maxsize=1)
+def _webhook_url() -> Optional[str]:
+    """Get n8n webhook URL from environment or secrets, once per process."""
+    webhook_url = _config_value("N8N_WEBHOOK_URL")
+
+    if webhook_url:
+        logger.info("n8n webhook URL configured")
+    else:
+        logger.warning("No n8n webhook URL found - integration disabled")
+
+    return webhook_url
+
+@functools.lru_cache(maxsize=1)
+def _batch_webhook_url() -> Optional[str]:
+    """
+    Get the opt-in n8n batch webhook URL, once per process.
+
+    Workflows on this URL receive a JSON array of events; without it, queued
+    events are posted one object per request to N8N_WEBHOOK_URL.
+    """
+    batch_url = _config_value("N8N_BATCH_WEBHOOK_URL")
+    if batch_url:
+        logger.info("n8n batch webhook URL configured")
+    return batch_url
+
 class N8nIntegration:
     """Handles n8n webhook integrations with retry logic."""
 
     def __init__(self):
-        self.webhook_url = self._get_webhook_url()
+        self.webhook_url = _webhook_url()
+        self.batch_webhook_url = _batch_webhook_url()
         self.timeout = 5  # seconds
         self.max_retries = 2
-
-    def _get_webhook_url(self) -> Optional[str]:
-        """Get n8n webhook URL from environment or secrets."""
-        webhook_url = os.getenv("N8N_WEBHOOK_URL")
-
-        if not webhook_url:
-            try:
-                import streamlit as st
-                webhook_url = st.secrets.get("N8N_WEBHOOK_URL")
-            except:
-                pass
-
-        if webhook_url:
-            logger.info("n8n webhook URL configured")
-        else:
-            logger.warning("No n8n webhook URL found - integration disabled")
-
-        return webhook_url
+        self.session = self._create_session()
+
+        # Batched emotion posts
+        self.batch_interval = 2.0  # seconds to wait for a batch to fill
+        self.batch_flush_size = 8  # send early once this many are queued
+        self.max_batch_size = 16
+        self.max_queue_size = 256  # drop new events rather than grow without bound
+        self.exit_flush_timeout = 10.0  # seconds to spend delivering at shutdown
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def _create_session(self) -> requests.Session:
+        """Create a keep-alive session that retries transient webhook failures."""
+        retry_kwargs = {
+            "total": self.max_retries,
+            "backoff_factor": 0.5,
+            "status_forcelist": [502, 503, 504],
+            "raise_on_status": False
+        }
+        try:
+            retry = Retry(allowed_methods=frozenset(["POST"]), **retry_kwargs)
+        except TypeError:
+            # urllib3 < 1.26
+            retry = Retry(method_whitelist=frozenset(["POST"]), **retry_kwargs)
+
+        session = requests.Session()
+        session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+        session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+        session.headers.update({
+            "Content-Type": "application/json",
+            "User-Agent": "EmpathyAI/1.0"
+        })
+        return session
 
     def send_emotion_data(self, user_id: str, emotion_data: Dict[str, Any]) -> bool:
         """
@@ -61,16 +135,150 @@ class N8nIntegration:
 
         return self._send_webhook(payload)
 
+    def queue_emotion_data(self, user_id: str, emotion_data: Dict[str, Any]) -> bool:
+        """
+        Queue emotion data to be sent to n8n in a background batch.
+
+        Args:
+            user_id (str): User identifier
+            emotion_data (dict): Emotion analysis results
+
+        Returns:
+            bool: Whether the record was queued
+        """
+        if not self.webhook_url:
+            return False
+
+        return self._enqueue({
+            "timestamp": datetime.utcnow().isoformat(),
+            "user_id": user_id,
+            "event_type": "emotion_detected",
+            "data": emotion_data
+        })
+
+    def _enqueue(self, payload: Dict[str, Any]) -> bool:
+        """Hand an event to the background worker without blocking."""
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            logger.warning(f"n8n queue full - dropping {payload['event_type']} event")
+            return False
+        self._ensure_worker()
+        return True
+
+    def flush_queue(self, timeout: Optional[float] = None) -> bool:
+        """
+        Send every queued record now, and wait for the batch in flight.
+
+        Args:
+            timeout (float): Stop starting new requests after this many seconds
+
+        Returns:
+            bool: Whether everything queued was delivered
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        success = True
+        while deadline is None or time.monotonic() < deadline:
+            batch = self._drain_queue([], self.max_batch_size)
+            if not batch:
+                break
+            success = self._deliver(batch, deadline) and success
+
+        # Give the worker's current batch the rest of the time to finish
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return success
+
+    def _ensure_worker(self):
+        """Start the background batch worker once per process."""
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._batch_worker, name="n8n-batcher", daemon=True
+                )
+                self._worker.start()
+                atexit.register(self.flush_queue, self.exit_flush_timeout)
+
+    def _batch_worker(self):
+        """Collect queued records and deliver them off the request path."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_interval
+
+            # Wait for the batch to fill up, but never past the interval
+            while len(batch) < self.batch_flush_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            batch = self._drain_queue(batch, self.max_batch_size)
+            try:
+                self._deliver(batch)
+            except Exception as e:
+                logger.error(f"n8n batch delivery failed: {e}")
+
+    def _deliver(self, batch: List[Dict[str, Any]], deadline: Optional[float] = None) -> bool:
+        """
+        Post a batch of queued events and mark them done on the queue.
+
+        The batch goes out as one JSON array when N8N_BATCH_WEBHOOK_URL is
+        set; otherwise each event is posted as its own object.
+        """
+        try:
+            if self.batch_webhook_url:
+                timeout = self._request_timeout(deadline)
+                return timeout is not None and self._send_webhook(
+                    batch, url=self.batch_webhook_url, timeout=timeout
+                )
+
+            success = True
+            for payload in batch:
+                timeout = self._request_timeout(deadline)
+                if timeout is None:
+                    return False
+                success = self._send_webhook(payload, timeout=timeout) and success
+            return success
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _request_timeout(self, deadline: Optional[float]) -> Optional[float]:
+        """Per-request timeout that keeps a flush within its deadline."""
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        # The session may retry, so split what is left across the attempts
+        return min(self.timeout, remaining / (self.max_retries + 1))
+
+    def _drain_queue(self, batch: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """Top up a batch with already-queued records without blocking."""
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
     def send_conversation_data(self, user_id: str, conversation_data: Dict[str, Any]) -> bool:
         """
-        Send conversation data to n8n workflow.
+        Queue conversation data for background delivery to n8n.
 
         Args:
             user_id (str): User identifier  
             conversation_data (dict): Conversation details
 
         Returns:
-            bool: Success status
+            bool: Whether the event was queued
         """
         if not self.webhook_url:
             return False
@@ -82,18 +290,18 @@ class N8nIntegration:
             "data": conversation_data
         }
 
-        return self._send_webhook(payload)
+        return self._enqueue(payload)
 
     def send_user_analytics(self, user_id: str, analytics_data: Dict[str, Any]) -> bool:
         """
-        Send user analytics to n8n workflow.
+        Queue user analytics for background delivery to n8n.
 
         Args:
             user_id (str): User identifier
             analytics_data (dict): Analytics summary
 
         Returns:
-            bool: Success status  
+            bool: Whether the event was queued
         """
         if not self.webhook_url:
             return False
@@ -105,47 +313,38 @@ class N8nIntegration:
             "data": analytics_data
         }
 
-        return self._send_webhook(payload)
+        return self._enqueue(payload)
 
-    def _send_webhook(self, payload: Dict[str, Any]) -> bool:
+    def _send_webhook(self, payload: Union[Dict[str, Any], List[Dict[str, Any]]],
+                      url: Optional[str] = None, timeout: Optional[float] = None) -> bool:
         """
-        Send webhook with retry logic.
+        Send webhook; the session retries connection errors and 5xx responses.
 
         Args:
-            payload (dict): Data to send
+            payload (dict | list): Data to send, or a batch of events
+            url (str): Target URL, defaults to the single-event webhook
+            timeout (float): Request timeout, defaults to self.timeout
 
         Returns:
             bool: Success status
         """
-        for attempt in range(self.max_retries):
-            try:
-                response = requests.post(
-                    self.webhook_url,
-                    json=payload,
-                    timeout=self.timeout,
-                    headers={
-                        "Content-Type": "application/json",
-                        "User-Agent": "EmpathyAI/1.0"
-                    }
-                )
-
-                if response.status_code in [200, 201, 202]:
-                    logger.info(f"n8n webhook sent successfully (attempt {attempt + 1})")
-                    return True
-                else:
-                    logger.warning(f"n8n webhook failed with status {response.status_code}")
+        try:
+            response = self.session.post(
+                url or self.webhook_url, data=_encode_payload(payload),
+                timeout=timeout or self.timeout
+            )
 
-            except requests.exceptions.Timeout:
-                logger.warning(f"n8n webhook timeout (attempt {attempt + 1})")
-            except requests.exceptions.ConnectionError:
-                logger.warning(f"n8n webhook connection error (attempt {attempt + 1})")
-            except Exception as e:
-                logger.error(f"n8n webhook error (attempt {attempt + 1}): {e}")
+            if response.status_code in [200, 201, 202]:
+                logger.info("n8n webhook sent successfully")
+                return True
+            logger.warning(f"n8n webhook failed with status {response.status_code}")
 
-            # Don't retry on the last attempt
-            if attempt < self.max_retries - 1:
-                import time
-                time.sleep(1)  # Brief delay before retry
+        except requests.exceptions.Timeout:
+            logger.warning("n8n webhook timeout")
+        except requests.exceptions.ConnectionError:
+            logger.warning("n8n webhook connection error")
+        except Exception as e:
+            logger.error(f"n8n webhook error: {e}")
 
         logger.error("n8n webhook failed after all retries")
         return False
@@ -171,9 +370,9 @@ class N8nIntegration:
         }
 
         try:
-            response = requests.post(
+            response = self.session.post(
                 self.webhook_url,
-                json=test_payload,
+                data=_encode_payload(test_payload),
                 timeout=self.timeout
             )
 
@@ -226,11 +425,37 @@ def post_emotion_record(user_id: str, emotion_label: str, confidence: float = No
 
     return integration.send_emotion_data(user_id, emotion_data)
 
+def queue_emotion_record(user_id: str, emotion_label: str, confidence: float = None,
+                         message: str = None, session_id: str = None) -> bool:
+    """
+    Queue an emotion record for batched background delivery to n8n.
+
+    Args:
+        user_id (str): User identifier
+        emotion_label (str): Detected emotion
+        confidence (float): Confidence score
+        message (str): User message
+        session_id (str): Session identifier
+
+    Returns:
+        bool: Whether the record was queued
+    """
+    integration = get_n8n_integration()
+
+    emotion_data = {
+        "emotion": emotion_label,
+        "confidence": confidence or 0.5,
+        "message": message or "",
+        "session_id": session_id or ""
+    }
+
+    return integration.queue_emotion_data(user_id, emotion_data)
+
 def post_conversation_summary(user_id: str, session_id: str, 
                             message_count: int, emotions: list, 
                             duration_minutes: float = None) -> bool:
     """
-    Post conversation summary to n8n.
+    Queue a conversation summary for delivery to n8n.
 
     Args:
         user_id (str): User identifier
@@ -240,7 +465,7 @@ def post_conversation_summary(user_id: str, session_id: str,
         duration_minutes (float): Conversation duration
 
     Returns:
-        bool: Success status
+        bool: Whether the event was queued
     """
     integration = get_n8n_integration()
 
@@ -249,7 +474,8 @@ def post_conversation_summary(user_id: str, session_id: str,
         "message_count": message_count,
         "emotions_detected": emotions,
         "duration_minutes": duration_minutes,
-        "summary": f"Conversation with {message_count} messages, emotions: {', '.join(emotions)}"
+        # Distinct emotions in first-seen order; the full list is sent above
+        "summary": f"Conversation with {message_count} messages, emotions: {', '.join(dict.fromkeys(emotions))}"
     }
 
     return integration.send_conversation_data(user_id, conversation_data)
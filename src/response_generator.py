@@ -3,110 +3,296 @@ Intelligent response generation system that combines emotion analysis
 with LLM capabilities to create empathetic, contextually appropriate responses.
 """
 
+import hashlib
 import logging
-from typing import Dict, List, Optional
-from .llm_response import ask_gemini
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+from .llm_response import ask_gemini, ask_gemini_stream, is_fallback_response
+from .semantic_cache import get_semantic_cache
 
 logger = logging.getLogger(__name__)
 
+# Conversation turns kept per session, and sessions kept per process. This
+# only caches history in process to skip the stored-history read; Gemini has
+# no server-side conversation state here, so each prompt still carries the
+# last HISTORY_TURNS turns.
+HISTORY_TURNS = 3
+MAX_SESSIONS = 256
+
+# Gemini requests in flight at once for batched generation
+BATCH_CONCURRENCY = 8
+
+# Validated LLM replies keyed on normalized message, emotion and recent history.
+# This is the only Gemini reply cache. Replies are sampled at temperature 0.7
+# and still cached, so an identical message with identical history gets the
+# same reply until its entry expires.
+REPLY_CACHE_SIZE = 4096
+REPLY_CACHE_TTL = 3600  # seconds
+_reply_cache: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+_reply_cache_lock = threading.Lock()
+
+class _ReplyKey(NamedTuple):
+    """Exact cache digest, plus the user and message for semantic lookups on opening turns."""
+    digest: bytes
+    primary_emotion: str
+    semantic_text: Optional[str]
+    user_id: Optional[str]
+
+# Template responses for when the LLM is unavailable
+RESPONSE_TEMPLATES: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "sadness": (
+        "I can hear the sadness in your words, and I want you to know that it's okay to feel this way. Your emotions are valid, and you don't have to go through this alone. 💙",
+        "It sounds like you're carrying some heavy feelings right now. Remember that sadness, while painful, is also a sign of your capacity to care deeply. I'm here with you. 🫂",
+        "I see you're going through a difficult time. Please be gentle with yourself. These feelings won't last forever, even though they feel overwhelming right now. 🌸"
+    ),
+    "anger": (
+        "I can sense your frustration, and those feelings are completely valid. It's human to feel angry sometimes. Let's take a moment to breathe together. 🌱",
+        "Your anger is telling you something important about what matters to you. Let's explore what's underneath these feelings in a safe way. 💚",
+        "I hear how upset you are. It takes courage to express difficult emotions. You're doing the right thing by talking about it instead of keeping it inside. 🤗"
+    ),
+    "fear": (
+        "I can feel your worry, and I want you to know that you're safe here with me. Fear can be overwhelming, but you're braver than you think. 🦋",
+        "Anxiety can make everything feel uncertain, but remember: you've faced difficult moments before and you're still here. That's strength. 🌟",
+        "Your fears are real and valid. Let's take this one breath at a time. You don't have to face this alone. I'm right here with you. 🫧"
+    ),
+    "joy": (
+        "I can feel your happiness radiating through your words! It's wonderful to witness your joy. Please take a moment to really savor this feeling. ✨",
+        "Your positive energy is infectious! I'm so glad you're experiencing this happiness. You deserve these beautiful moments. 🌻",
+        "What a delightful thing to hear! Your joy reminds me of all the good that exists in the world. Thank you for sharing this brightness. ☀️"
+    ),
+    "neutral": (
+        "I'm here and I'm listening. Whatever you're going through, you don't have to face it alone. Your feelings matter. 🤗",
+        "Thank you for trusting me with your thoughts. I'm honored to be part of your journey, whatever it may bring. 💜",
+        "I hear you, and I'm with you in this moment. Sometimes just being acknowledged is enough. How are you really doing? 🌙"
+    )
+})
+
+# System prompts per emotional context, whitespace collapsed so the source
+# indentation isn't sent to Gemini as input tokens
+SYSTEM_PROMPTS: Mapping[str, str] = MappingProxyType({
+    name: " ".join(prompt.split()) for name, prompt in {
+        "default": """You are EmpathyAI, a compassionate mental health companion. 
+                     Respond with warmth, understanding, and genuine care. 
+                     Keep responses under 120 words. Be supportive but not clinical.
+                     Use gentle, encouraging language.""",
+
+        "sadness": """You are EmpathyAI, speaking to someone feeling sad or down.
+                     Show deep empathy and validation. Offer gentle comfort and hope.
+                     Remind them that sadness is temporary and they're not alone.
+                     Keep under 120 words.""",
+
+        "anger": """You are EmpathyAI, helping someone process anger or frustration.
+                    Validate their feelings without encouraging harmful actions.
+                    Help them find healthy ways to express and process anger.
+                    Stay calm and grounding. Keep under 120 words.""",
+
+        "fear": """You are EmpathyAI, supporting someone experiencing fear or anxiety.
+                   Offer reassurance and practical coping strategies.
+                   Help them feel safe and grounded in the present moment.
+                   Use calming, confident language. Under 120 words.""",
+
+        "joy": """You are EmpathyAI, celebrating positive emotions with someone.
+                  Share in their happiness and help them savor the moment.
+                  Encourage them to appreciate and remember this feeling.
+                  Be warm and uplifting. Keep under 120 words."""
+    }.items()
+})
+
+# Shared response guidance. It follows the system prompt so that every prompt
+# for an emotion starts with the same text, which Gemini can cache implicitly
+RESPONSE_GUIDANCE = """Please respond with empathy, understanding, and genuine care. Focus on:
+1. Acknowledging their emotional state (given below)
+2. Providing appropriate support and validation
+3. Being warm but not overly clinical
+4. Keeping response under 120 words"""
+
+_PROMPT_PREFIXES: Mapping[str, str] = MappingProxyType({
+    name: f"{prompt}\n\n{RESPONSE_GUIDANCE}" for name, prompt in SYSTEM_PROMPTS.items()
+})
+
+# Phrases that make an LLM reply unsuitable, matched case-insensitively in one scan
+_INAPPROPRIATE_PATTERN = re.compile("|".join(map(re.escape, (
+    "i'm just an ai", "i'm not a therapist", "seek professional help immediately",
+    "i can't help with that", "that's not my job"
+))), re.I)
+
+# Emotion labels mapped to primary emotion categories
+_EMOTION_TO_PRIMARY = {
+    "sadness": "sadness",
+    "anger": "anger",
+    "fear": "fear",
+    "anxiety": "fear",
+    "joy": "joy",
+    "happiness": "joy",
+    "surprise": "neutral",
+    "disgust": "anger",
+    "love": "joy",
+    "optimism": "joy",
+    "pessimism": "sadness"
+}
+
+# Every label the fusion step produces, resolved with one lookup
+_FUSED_TO_PRIMARY = {
+    (f"{sentiment}-{emotion}" if sentiment else emotion): primary
+    for sentiment in ("negative", "positive", "neutral", "")
+    for emotion, primary in _EMOTION_TO_PRIMARY.items()
+}
+
+# Emotion-specific words that raise response confidence. Substring matches, so
+# "understand" also counts "understanding" and "breath" counts "breathe"
+_EMOTION_KEYWORD_PATTERNS = {
+    emotion: re.compile("|".join(keywords), re.I)
+    for emotion, keywords in {
+        "sadness": ("sad", "difficult", "understand", "support", "comfort"),
+        "anger": ("frustrated", "angry", "valid", "breath", "calm"),
+        "fear": ("anxiety", "worry", "safe", "brave", "strength"),
+        "joy": ("happy", "wonderful", "celebrate", "joy", "bright")
+    }.items()
+}
+
+_TEMPLATE_TEXTS = frozenset(text for templates in RESPONSE_TEMPLATES.values() for text in templates)
+
+def _reply_cache_key(user_text: str, fused_emotion: str, primary_emotion: str,
+                     history: Optional[List], user_id: Optional[str] = None) -> _ReplyKey:
+    """Key a reply on everything that shapes its prompt."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{user_text.strip().lower()}|{fused_emotion}".encode("utf-8"))
+    for item in (history or [])[-HISTORY_TURNS:]:
+        if isinstance(item, dict):
+            digest.update(f"|{item.get('user', '')}|{item.get('ai', '')}".encode("utf-8"))
+
+    # Paraphrase matching ignores history, so only opening turns may use it,
+    # and only within one user's own replies
+    semantic_text = None if history or not user_id else user_text.strip()
+    return _ReplyKey(digest.digest(), primary_emotion, semantic_text, user_id)
+
+def _get_cached_reply(key: _ReplyKey) -> Optional[str]:
+    """Return a cached reply for the exact message, else for a close paraphrase."""
+    with _reply_cache_lock:
+        entry = _reply_cache.get(key.digest)
+        if entry is not None:
+            stored_at, reply = entry
+            if time.monotonic() - stored_at <= REPLY_CACHE_TTL:
+                _reply_cache.move_to_end(key.digest)
+                return reply
+            del _reply_cache[key.digest]
+
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None and key.semantic_text:
+        return semantic_cache.lookup(key.semantic_text, key.user_id, key.primary_emotion)
+    return None
+
+def _store_reply(key: _ReplyKey, llm_response: str, reply: str):
+    """Cache a validated reply unless it came from a fallback or template."""
+    if is_fallback_response(llm_response.strip()) or reply in _TEMPLATE_TEXTS:
+        return
+
+    with _reply_cache_lock:
+        _reply_cache[key.digest] = (time.monotonic(), reply)
+        _reply_cache.move_to_end(key.digest)
+        if len(_reply_cache) > REPLY_CACHE_SIZE:
+            _reply_cache.popitem(last=False)
+
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None and key.semantic_text:
+        semantic_cache.add(key.semantic_text, key.user_id, key.primary_emotion, reply)
+
 class EmpathyResponseGenerator:
     """Generates empathetic responses based on emotional context."""
 
     def __init__(self):
         self.system_prompts = self._load_system_prompts()
+        self.prompt_prefixes = _PROMPT_PREFIXES
         self.response_templates = self._load_response_templates()
-
-    def _load_system_prompts(self) -> Dict[str, str]:
-        """Load system prompts for different emotional contexts."""
-        return {
-            "default": """You are EmpathyAI, a compassionate mental health companion. 
-                         Respond with warmth, understanding, and genuine care. 
-                         Keep responses under 120 words. Be supportive but not clinical.
-                         Use gentle, encouraging language. Acknowledge emotions: {emotion}.""",
-
-            "sadness": """You are EmpathyAI, speaking to someone feeling sad or down.
-                         Show deep empathy and validation. Offer gentle comfort and hope.
-                         Remind them that sadness is temporary and they're not alone.
-                         Keep under 120 words. Emotion context: {emotion}.""",
-
-            "anger": """You are EmpathyAI, helping someone process anger or frustration.
-                        Validate their feelings without encouraging harmful actions.
-                        Help them find healthy ways to express and process anger.
-                        Stay calm and grounding. Keep under 120 words. Emotion: {emotion}.""",
-
-            "fear": """You are EmpathyAI, supporting someone experiencing fear or anxiety.
-                       Offer reassurance and practical coping strategies.
-                       Help them feel safe and grounded in the present moment.
-                       Use calming, confident language. Under 120 words. Emotion: {emotion}.""",
-
-            "joy": """You are EmpathyAI, celebrating positive emotions with someone.
-                      Share in their happiness and help them savor the moment.
-                      Encourage them to appreciate and remember this feeling.
-                      Be warm and uplifting. Keep under 120 words. Emotion: {emotion}."""
+        # Shuffled once, then rotated so consecutive fallbacks don't repeat
+        self._template_rotations = {
+            emotion: deque(random.sample(templates, len(templates)))
+            for emotion, templates in self.response_templates.items()
         }
+        self._session_turns: "OrderedDict[str, deque]" = OrderedDict()
+        # Streamlit sessions generate on their own script threads
+        self._session_lock = threading.Lock()
+
+    def has_session(self, session_id: str) -> bool:
+        """Check whether conversation state is held for a session."""
+        with self._session_lock:
+            return session_id in self._session_turns
+
+    def _get_session_history(self, session_id: str, seed_history: Optional[List]) -> Tuple[deque, List]:
+        """Get the turn buffer for a session, seeding it on first use, and a snapshot of it."""
+        with self._session_lock:
+            turns = self._session_turns.get(session_id)
+            if turns is None:
+                turns = deque(seed_history or [], maxlen=HISTORY_TURNS)
+                self._session_turns[session_id] = turns
+                if len(self._session_turns) > MAX_SESSIONS:
+                    self._session_turns.popitem(last=False)
+            else:
+                self._session_turns.move_to_end(session_id)
+            return turns, list(turns)
+
+    def _record_turn(self, turns: Optional[deque], user_text: str, reply: str):
+        """Append a finished turn to a session's buffer."""
+        if turns is None:
+            return
+        with self._session_lock:
+            turns.append({"user": user_text, "ai": reply})
+
+    def _load_system_prompts(self) -> Mapping[str, str]:
+        """Load system prompts for different emotional contexts."""
+        return SYSTEM_PROMPTS
 
-    def _load_response_templates(self) -> Dict[str, List[str]]:
+    def _load_response_templates(self) -> Mapping[str, Tuple[str, ...]]:
         """Load template responses for when LLM is unavailable."""
-        return {
-            "sadness": [
-                "I can hear the sadness in your words, and I want you to know that it's okay to feel this way. Your emotions are valid, and you don't have to go through this alone. 💙",
-                "It sounds like you're carrying some heavy feelings right now. Remember that sadness, while painful, is also a sign of your capacity to care deeply. I'm here with you. 🫂",
-                "I see you're going through a difficult time. Please be gentle with yourself. These feelings won't last forever, even though they feel overwhelming right now. 🌸"
-            ],
-            "anger": [
-                "I can sense your frustration, and those feelings are completely valid. It's human to feel angry sometimes. Let's take a moment to breathe together. 🌱",
-                "Your anger is telling you something important about what matters to you. Let's explore what's underneath these feelings in a safe way. 💚",
-                "I hear how upset you are. It takes courage to express difficult emotions. You're doing the right thing by talking about it instead of keeping it inside. 🤗"
-            ],
-            "fear": [
-                "I can feel your worry, and I want you to know that you're safe here with me. Fear can be overwhelming, but you're braver than you think. 🦋",
-                "Anxiety can make everything feel uncertain, but remember: you've faced difficult moments before and you're still here. That's strength. 🌟",
-                "Your fears are real and valid. Let's take this one breath at a time. You don't have to face this alone. I'm right here with you. 🫧"
-            ],
-            "joy": [
-                "I can feel your happiness radiating through your words! It's wonderful to witness your joy. Please take a moment to really savor this feeling. ✨",
-                "Your positive energy is infectious! I'm so glad you're experiencing this happiness. You deserve these beautiful moments. 🌻",
-                "What a delightful thing to hear! Your joy reminds me of all the good that exists in the world. Thank you for sharing this brightness. ☀️"
-            ],
-            "neutral": [
-                "I'm here and I'm listening. Whatever you're going through, you don't have to face it alone. Your feelings matter. 🤗",
-                "Thank you for trusting me with your thoughts. I'm honored to be part of your journey, whatever it may bring. 💜",
-                "I hear you, and I'm with you in this moment. Sometimes just being acknowledged is enough. How are you really doing? 🌙"
-            ]
-        }
+        return RESPONSE_TEMPLATES
 
-    def generate_response(self, user_text: str, fused_emotion: str, user_history: Optional[List] = None) -> Dict[str, str]:
+    def generate_response(self, user_text: str, fused_emotion: str, user_history: Optional[List] = None,
+                          session_id: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, str]:
         """
         Generate an empathetic response based on user input and emotional context.
 
         Args:
             user_text (str): The user's input message
             fused_emotion (str): The fused emotion-sentiment label
-            user_history (List): Optional conversation history
+            user_history (List): Optional conversation history, used to seed
+                a session that has no stored state yet
+            session_id (str): Optional session whose turns are kept between calls
+            user_id (str): Optional user whose earlier replies may answer paraphrases
 
         Returns:
             Dict: Contains the response and metadata
         """
         try:
-            # Extract primary emotion from fused label
-            primary_emotion = self._extract_primary_emotion(fused_emotion)
+            session_turns, primary_emotion, prompt, cache_key = self._prepare_generation(
+                user_text, fused_emotion, user_history, session_id, user_id
+            )
 
-            # Build context-aware prompt
-            prompt = self._build_prompt(user_text, fused_emotion, primary_emotion, user_history)
+            final_response = _get_cached_reply(cache_key)
+            if final_response is not None:
+                llm_response = final_response
+            else:
+                # Generate response using LLM
+                llm_response = ask_gemini(prompt, temperature=0.7)
 
-            # Generate response using LLM
-            llm_response = ask_gemini(prompt, temperature=0.7)
+                # Validate and enhance response if needed
+                final_response = self._validate_and_enhance_response(
+                    llm_response, primary_emotion, user_text
+                )
+                _store_reply(cache_key, llm_response, final_response)
 
-            # Validate and enhance response if needed
-            final_response = self._validate_and_enhance_response(
-                llm_response, primary_emotion, user_text
-            )
+            self._record_turn(session_turns, user_text, final_response)
 
             return {
                 "response": final_response,
                 "emotion_detected": fused_emotion,
                 "primary_emotion": primary_emotion,
-                "generation_method": "llm" if "fallback" not in llm_response.lower() else "template",
+                "generation_method": "template" if is_fallback_response(llm_response.strip()) else "llm",
                 "confidence": self._calculate_response_confidence(final_response, fused_emotion)
             }
 
@@ -114,63 +300,55 @@ class EmpathyResponseGenerator:
             logger.error(f"Response generation failed: {e}")
             return self._fallback_response(user_text, fused_emotion)
 
+    def _prepare_generation(self, user_text: str, fused_emotion: str, user_history: Optional[List],
+                            session_id: Optional[str],
+                            user_id: Optional[str] = None) -> Tuple[Optional[deque], str, str, _ReplyKey]:
+        """Resolve session history, primary emotion, prompt and reply cache key for one turn."""
+        session_turns = None
+        if session_id:
+            session_turns, user_history = self._get_session_history(session_id, user_history)
+
+        # Extract primary emotion from fused label
+        primary_emotion = self._extract_primary_emotion(fused_emotion)
+
+        # Build context-aware prompt
+        prompt = self._build_prompt(user_text, fused_emotion, primary_emotion, user_history)
+
+        cache_key = _reply_cache_key(user_text, fused_emotion, primary_emotion, user_history, user_id)
+        return session_turns, primary_emotion, prompt, cache_key
+
     def _extract_primary_emotion(self, fused_emotion: str) -> str:
         """Extract primary emotion from fused label."""
         if not fused_emotion:
             return "neutral"
 
-        # Handle fused emotions like "negative-sadness"
-        parts = fused_emotion.lower().split("-")
-        if len(parts) > 1:
-            emotion = parts[-1]  # Take the emotion part
-        else:
-            emotion = parts[0]
-
-        # Map to primary emotion categories
-        emotion_mapping = {
-            "sadness": "sadness",
-            "anger": "anger",
-            "fear": "fear",
-            "anxiety": "fear",
-            "joy": "joy",
-            "happiness": "joy",
-            "surprise": "neutral",
-            "disgust": "anger",
-            "love": "joy",
-            "optimism": "joy",
-            "pessimism": "sadness"
-        }
+        primary_emotion = _FUSED_TO_PRIMARY.get(fused_emotion)
+        if primary_emotion is not None:
+            return primary_emotion
 
-        return emotion_mapping.get(emotion, "neutral")
+        # Handle other fused emotions like "NEGATIVE-Sadness"
+        emotion = fused_emotion.lower().rsplit("-", 1)[-1]
+        return _EMOTION_TO_PRIMARY.get(emotion, "neutral")
 
     def _build_prompt(self, user_text: str, fused_emotion: str, primary_emotion: str, history: Optional[List]) -> str:
-        """Build a context-aware prompt for the LLM."""
-        # Select appropriate system prompt
-        system_prompt = self.system_prompts.get(primary_emotion, self.system_prompts["default"])
-        system_prompt = system_prompt.format(emotion=fused_emotion)
+        """Build a context-aware prompt for the LLM, stable prefix first."""
+        prefix = self.prompt_prefixes.get(primary_emotion, self.prompt_prefixes["default"])
 
         # Add conversation history if available
         history_context = ""
         if history and len(history) > 0:
-            recent_history = history[-3:]  # Last 3 interactions
+            recent_history = history[-HISTORY_TURNS:]  # Last 3 interactions
             history_context = "\n\nRecent conversation context:\n"
             for i, item in enumerate(recent_history, 1):
                 if isinstance(item, dict):
                     history_context += f"{i}. User: {item.get('user', '')}, AI: {item.get('ai', '')}\n"
 
-        # Combine into final prompt
-        full_prompt = f"""{system_prompt}
-
-{history_context}
+        # Everything that varies per turn goes after the prefix
+        full_prompt = f"""{prefix}{history_context}
 
+Emotional state: {fused_emotion}
 Current user message: "{user_text}"
 
-Please respond with empathy, understanding, and genuine care. Focus on:
-1. Acknowledging their emotional state ({fused_emotion})
-2. Providing appropriate support and validation
-3. Being warm but not overly clinical
-4. Keeping response under 120 words
-
 Response:"""
 
         return full_prompt
@@ -181,13 +359,7 @@ Response:"""
             return self._get_template_response(emotion, user_text)
 
         # Check for inappropriate content (basic filtering)
-        inappropriate_phrases = [
-            "i'm just an ai", "i'm not a therapist", "seek professional help immediately",
-            "i can't help with that", "that's not my job"
-        ]
-
-        response_lower = response.lower()
-        if any(phrase in response_lower for phrase in inappropriate_phrases):
+        if _INAPPROPRIATE_PATTERN.search(response):
             return self._get_template_response(emotion, user_text)
 
         # Ensure response isn't too long
@@ -199,9 +371,9 @@ Response:"""
 
     def _get_template_response(self, emotion: str, user_text: str) -> str:
         """Get a template response for the given emotion."""
-        import random
-        templates = self.response_templates.get(emotion, self.response_templates["neutral"])
-        return random.choice(templates)
+        templates = self._template_rotations.get(emotion, self._template_rotations["neutral"])
+        templates.rotate(-1)
+        return templates[0]
 
     def _calculate_response_confidence(self, response: str, emotion: str) -> float:
         """Calculate confidence score for the response."""
@@ -212,15 +384,8 @@ Response:"""
             base_confidence += 0.1
 
         # Increase confidence if emotion-specific words are present
-        emotion_keywords = {
-            "sadness": ["sad", "difficult", "understand", "support", "comfort"],
-            "anger": ["frustrated", "angry", "valid", "breath", "calm"],
-            "fear": ["anxiety", "worry", "safe", "brave", "strength"],
-            "joy": ["happy", "wonderful", "celebrate", "joy", "bright"]
-        }
-
-        keywords = emotion_keywords.get(emotion, [])
-        if keywords and any(keyword in response.lower() for keyword in keywords):
+        keywords = _EMOTION_KEYWORD_PATTERNS.get(emotion)
+        if keywords and keywords.search(response):
             base_confidence += 0.1
 
         return min(base_confidence, 1.0)
@@ -238,6 +403,58 @@ Response:"""
             "confidence": 0.5
         }
 
+class ResponseStream:
+    """
+    Iterable over response chunks as the LLM produces them.
+
+    Once exhausted, ``response`` holds the validated final response. It can
+    differ from the streamed text when the LLM output was replaced by a
+    template, so callers should display ``response`` after streaming.
+    """
+
+    def __init__(self, generator: EmpathyResponseGenerator, user_text: str, fused_emotion: str,
+                 user_history: Optional[List] = None, session_id: Optional[str] = None,
+                 user_id: Optional[str] = None):
+        self._generator = generator
+        self._user_text = user_text
+        self._fused_emotion = fused_emotion
+        self._user_history = user_history
+        self._session_id = session_id
+        self._user_id = user_id
+        self.response = None
+
+    def __iter__(self) -> Iterator[str]:
+        streamed = []
+        try:
+            session_turns, primary_emotion, prompt, cache_key = self._generator._prepare_generation(
+                self._user_text, self._fused_emotion, self._user_history, self._session_id,
+                self._user_id
+            )
+
+            cached = _get_cached_reply(cache_key)
+            if cached is not None:
+                self.response = cached
+                yield cached
+            else:
+                for chunk in ask_gemini_stream(prompt, temperature=0.7):
+                    streamed.append(chunk)
+                    yield chunk
+
+                llm_response = "".join(streamed)
+                self.response = self._generator._validate_and_enhance_response(
+                    llm_response, primary_emotion, self._user_text
+                )
+                _store_reply(cache_key, llm_response, self.response)
+
+            self._generator._record_turn(session_turns, self._user_text, self.response)
+
+        except Exception as e:
+            logger.error(f"Response streaming failed: {e}")
+            fallback = self._generator._fallback_response(self._user_text, self._fused_emotion)
+            self.response = fallback["response"]
+            if not streamed:
+                yield self.response
+
 # Global generator instance
 _generator = None
 
@@ -248,18 +465,65 @@ def get_generator() -> EmpathyResponseGenerator:
         _generator = EmpathyResponseGenerator()
     return _generator
 
-def craft_empathy_response(user_text: str, fused_emotion: str, history: Optional[List] = None) -> str:
+def craft_empathy_response(user_text: str, fused_emotion: str, history: Optional[List] = None,
+                           session_id: Optional[str] = None, user_id: Optional[str] = None) -> str:
     """
     Convenient function to generate empathetic response.
 
     Args:
         user_text (str): User's input
         fused_emotion (str): Detected emotion
-        history (List): Conversation history
+        history (List): Conversation history (only needed for unseen sessions)
+        session_id (str): Session identifier for persisted conversation state
+        user_id (str): User identifier, scoping paraphrase reuse to this user
 
     Returns:
         str: Generated empathetic response
     """
     generator = get_generator()
-    result = generator.generate_response(user_text, fused_emotion, history)
+    result = generator.generate_response(user_text, fused_emotion, history, session_id, user_id)
     return result["response"]
+
+def craft_empathy_response_stream(user_text: str, fused_emotion: str, history: Optional[List] = None,
+                                  session_id: Optional[str] = None,
+                                  user_id: Optional[str] = None) -> ResponseStream:
+    """
+    Convenient function to stream an empathetic response.
+
+    Args:
+        user_text (str): User's input
+        fused_emotion (str): Detected emotion
+        history (List): Conversation history (only needed for unseen sessions)
+        session_id (str): Session identifier for persisted conversation state
+        user_id (str): User identifier, scoping paraphrase reuse to this user
+
+    Returns:
+        ResponseStream: Iterable of chunks; ``response`` holds the final text
+    """
+    generator = get_generator()
+    return ResponseStream(generator, user_text, fused_emotion, history, session_id, user_id)
+
+def craft_empathy_responses_batch(items: List[Tuple[str, str, Optional[List]]]) -> List[str]:
+    """
+    Generate empathetic responses for several messages concurrently.
+
+    Prompts are built up front and the Gemini round-trips overlap on a small
+    thread pool, still subject to the client's rate limit.
+
+    Args:
+        items (List): (user_text, fused_emotion, history) tuples
+
+    Returns:
+        List[str]: Responses in the same order as ``items``
+    """
+    if not items:
+        return []
+
+    generator = get_generator()
+    with ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(items)),
+                            thread_name_prefix="empathy-batch") as executor:
+        results = executor.map(
+            lambda item: generator.generate_response(item[0], item[1], item[2])["response"],
+            items
+        )
+        return list(results)
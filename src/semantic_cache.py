@@ -0,0 +1,121 @@
+"""
+Semantic reply cache that reuses responses for paraphrased messages.
+Messages are embedded with a small sentence-transformer and matched by cosine similarity.
+"""
+
+import importlib.util
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Optional: pip install sentence-transformers, then set EMPATHYAI_SEMANTIC_CACHE=1.
+# Replies are only reused for the same user, so one user's reply (which may
+# echo personal details) is never served to someone else.
+SEMANTIC_CACHE_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+SEMANTIC_CACHE_ENABLED = SEMANTIC_CACHE_AVAILABLE and os.getenv("EMPATHYAI_SEMANTIC_CACHE") == "1"
+
+SIMILARITY_THRESHOLD = 0.92
+MAX_ENTRIES_PER_BUCKET = 64
+MAX_BUCKETS = 1024  # (user, emotion) buckets kept, least recently used dropped
+
+class SemanticCache:
+    """Per-user, per-emotion store of (normalized embedding, reply) pairs."""
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD,
+                 max_entries: int = MAX_ENTRIES_PER_BUCKET, max_buckets: int = MAX_BUCKETS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_buckets = max_buckets
+        self._model = None
+        self._buckets: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _encode(self, text: str):
+        """Embed text as a unit vector so a dot product is cosine similarity."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+                    logger.info("Semantic cache embedding model loaded")
+        return self._model.encode(text, normalize_embeddings=True)
+
+    def lookup(self, text: str, user_id: str, emotion: str) -> Optional[str]:
+        """
+        Find a cached reply for a paraphrase of text by the same user and emotion.
+
+        Args:
+            text (str): User message
+            user_id (str): User whose replies may be reused
+            emotion (str): Primary emotion bucket
+
+        Returns:
+            str: Cached reply, or None when nothing is similar enough
+        """
+        key = (user_id, emotion)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                return None
+            self._buckets.move_to_end(key)
+        matrix, replies = bucket
+
+        try:
+            scores = matrix @ self._encode(text)
+            best = int(scores.argmax())
+            if scores[best] >= self.threshold:
+                logger.debug(f"Semantic cache hit ({scores[best]:.3f}) for {emotion}")
+                return replies[best]
+        except Exception as e:
+            logger.error(f"Semantic cache lookup failed: {e}")
+        return None
+
+    def add(self, text: str, user_id: str, emotion: str, reply: str):
+        """Remember a reply, dropping the oldest entry once the bucket is full."""
+        import numpy as np
+
+        try:
+            embedding = self._encode(text)
+        except Exception as e:
+            logger.error(f"Semantic cache embedding failed: {e}")
+            return
+
+        key = (user_id, emotion)
+        with self._lock:
+            bucket = self._buckets.get(key)
+
+            # Rebind rather than mutate so concurrent lookups keep a consistent pair
+            if bucket is None:
+                matrix, replies = embedding[None, :], [reply]
+            else:
+                matrix, replies = np.vstack([bucket[0], embedding]), bucket[1] + [reply]
+            if len(replies) > self.max_entries:
+                matrix, replies = matrix[-self.max_entries:], replies[-self.max_entries:]
+
+            self._buckets[key] = (matrix, replies)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+
+# Global cache instance
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """Get the process-wide semantic cache, or None when it is disabled."""
+    global _semantic_cache
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    with _semantic_cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache()
+    return _semantic_cache
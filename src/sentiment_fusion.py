@@ -3,111 +3,362 @@ Multi-model sentiment fusion for nuanced emotion detection.
 Combines base sentiment with emotional context for richer understanding.
 """
 
-from transformers import pipeline
+import importlib.util
 import logging
-from typing import Dict, Optional
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
+BASE_SENTIMENT_MODEL = "siebert/sentiment-roberta-large-english"
+NUANCED_SENTIMENT_MODEL = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+FALLBACK_SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+
+# Inputs are truncated by the tokenizer to this many tokens
+MAX_INPUT_TOKENS = 512
+
+# Optional ONNX Runtime backend (pip install "optimum[onnxruntime]")
+ONNX_AVAILABLE = importlib.util.find_spec("optimum") is not None
+ONNX_CACHE_DIR = os.path.join(
+    os.getenv("EMPATHYAI_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "empathyai")),
+    "sentiment-onnx-int8"
+)
+ONNX_MODEL_FILE = "model_quantized.onnx"
+
+# Texts longer than this many characters are cut before tokenization
+MAX_TEXT_CHARS = 512
+
+# Texts per forward pass for batched analysis
+INFERENCE_BATCH_SIZE = 32
+
+# Micro-batching: single-text requests arriving within BATCH_WAIT seconds share a forward pass
+MAX_BATCH_SIZE = 8
+BATCH_WAIT = 0.01
+RESULT_TIMEOUT = 30  # seconds
+
+# Sentiment results kept per process, keyed on the stripped text
+SENTIMENT_CACHE_SIZE = 8192
+
+# Cardiff model labels mapped to the standard format
+_NUANCED_LABELS = {
+    "LABEL_0": "negative",
+    "LABEL_1": "neutral",
+    "LABEL_2": "positive"
+}
+
+class _SentimentClassifier:
+    """Tokenizer plus sequence-classification model, called without a pipeline."""
+
+    def __init__(self, tokenizer, model):
+        self.tokenizer = tokenizer
+        self.model = model
+        id2label = model.config.id2label
+        self.labels = tuple(id2label[i] for i in range(len(id2label)))
+
+    def __call__(self, texts: List[str]) -> List[Dict]:
+        """Classify texts, returning the top label and score for each."""
+        import torch
+
+        results = []
+        for start in range(0, len(texts), INFERENCE_BATCH_SIZE):
+            inputs = self.tokenizer(
+                texts[start:start + INFERENCE_BATCH_SIZE], padding=True, truncation=True,
+                max_length=MAX_INPUT_TOKENS, return_tensors="pt"
+            ).to(self.model.device)
+            with torch.inference_mode():
+                logits = self.model(**inputs).logits
+            scores, indices = torch.softmax(logits.float(), dim=-1).max(dim=-1)
+            results.extend(
+                {"label": self.labels[i], "score": score}
+                for i, score in zip(indices.tolist(), scores.tolist())
+            )
+        return results
+
 class SentimentFusion:
     """Combines multiple sentiment models for enhanced accuracy."""
 
     def __init__(self):
         self.base_model = None
         self.nuanced_model = None
+        self._queue = None
+        self._worker_lock = threading.Lock()
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Runs the nuanced model while the calling thread runs the base one
+        self._model_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sentiment-nuanced")
         self._initialize_models()
 
     def _initialize_models(self):
         """Initialize both sentiment analysis models."""
         try:
             # Base sentiment model
-            self.base_model = pipeline(
-                "sentiment-analysis",
-                model="siebert/sentiment-roberta-large-english",
-                device=-1
-            )
+            self.base_model = self._load_classifier(BASE_SENTIMENT_MODEL)
             logger.info("Base sentiment model loaded")
 
             # Nuanced tone model
-            self.nuanced_model = pipeline(
-                "sentiment-analysis", 
-                model="cardiffnlp/twitter-roberta-base-sentiment-latest",
-                device=-1
-            )
+            self.nuanced_model = self._load_classifier(NUANCED_SENTIMENT_MODEL)
             logger.info("Nuanced sentiment model loaded")
 
         except Exception as e:
             logger.error(f"Failed to initialize sentiment models: {e}")
             # Fallback to single model
             try:
-                self.base_model = pipeline("sentiment-analysis", device=-1)
+                self.base_model = self._load_classifier(FALLBACK_SENTIMENT_MODEL)
                 logger.info("Loaded fallback sentiment model")
             except:
                 logger.error("All sentiment models failed to load")
 
+        # Pay one-time session and allocator setup at load, not on the first message
+        try:
+            self._analyze_batch(["Warming up the sentiment models."])
+        except Exception as e:
+            logger.warning(f"Sentiment model warm-up failed: {e}")
+
+    def _load_classifier(self, model_id: str) -> _SentimentClassifier:
+        """Load a float16 GPU model when possible, else a CPU one preferring int8 ONNX Runtime."""
+        # Deferred so importing this module doesn't load transformers/torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(model_id, use_fast=True)
+
+        device = self._gpu_device()
+        if device is not None:
+            import torch
+            model = AutoModelForSequenceClassification.from_pretrained(
+                model_id, torch_dtype=torch.float16
+            ).to(device).eval()
+            logger.info(f"{model_id} placed on {device} (float16)")
+            return _SentimentClassifier(tokenizer, model)
+
+        if ONNX_AVAILABLE:
+            model = self._load_onnx_model(model_id)
+            if model is not None:
+                return _SentimentClassifier(tokenizer, model)
+
+        model = AutoModelForSequenceClassification.from_pretrained(model_id).eval()
+        return _SentimentClassifier(tokenizer, self._quantize_model(model))
+
+    def _gpu_device(self):
+        """Pick a CUDA or Apple MPS device for inference, or None for CPU."""
+        try:
+            import torch
+            if torch.cuda.is_available():
+                return "cuda"
+            if torch.backends.mps.is_available():
+                return "mps"
+        except Exception:
+            pass
+        return None
+
+    def _load_onnx_model(self, model_id: str):
+        """Load an int8 ONNX Runtime model, exporting it on first run."""
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+            cache_dir = os.path.join(ONNX_CACHE_DIR, model_id.replace("/", "--"))
+            if not os.path.exists(os.path.join(cache_dir, ONNX_MODEL_FILE)):
+                logger.info(f"Exporting int8 ONNX sentiment model to {cache_dir}")
+                fp32_model = ORTModelForSequenceClassification.from_pretrained(model_id, export=True)
+                fp32_model.save_pretrained(cache_dir)
+                quantizer = ORTQuantizer.from_pretrained(fp32_model)
+                quantizer.quantize(
+                    save_dir=cache_dir,
+                    quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False)
+                )
+
+            model = ORTModelForSequenceClassification.from_pretrained(
+                cache_dir, file_name=ONNX_MODEL_FILE, provider="CPUExecutionProvider"
+            )
+            logger.info(f"{model_id} running on ONNX Runtime (int8)")
+            return model
+        except Exception as e:
+            logger.warning(f"ONNX Runtime sentiment model unavailable, using PyTorch: {e}")
+            return None
+
+    def _quantize_model(self, model):
+        """Quantize linear layers to int8 for faster CPU inference."""
+        try:
+            import torch
+            return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        except Exception as e:
+            logger.warning(f"Int8 quantization unavailable, using full precision: {e}")
+            return model
+
     def analyze_sentiment(self, text: str) -> Dict:
         """
         Perform multi-model sentiment analysis.
 
+        Concurrent callers are coalesced into one batched pass per model.
+
         Args:
             text (str): Text to analyze
 
         Returns:
-            dict: Combined sentiment analysis
+            dict: Combined sentiment analysis (shared cache entry, do not mutate)
         """
         if not text or len(text.strip()) < 3:
             return self._default_sentiment()
 
+        text = text.strip()
+        cached = self._get_cached(text)
+        if cached is not None:
+            return cached
+
         try:
-            # Truncate long text
-            text = text[:512] if len(text) > 512 else text
+            # Hand the text to the batch worker and wait for its result
+            self._start_batch_worker()
+            future = Future()
+            self._queue.put((text, future))
+            return future.result(timeout=RESULT_TIMEOUT)
+
+        except Exception as e:
+            logger.error(f"Sentiment analysis failed: {e}")
+            return self._default_sentiment()
 
-            base_result = self._get_base_sentiment(text)
-            nuanced_result = self._get_nuanced_sentiment(text)
+    def analyze_sentiments_batch(self, texts: List[str]) -> List[Dict]:
+        """
+        Perform multi-model sentiment analysis on many texts at once.
 
-            return {
+        Each model runs once over the whole list instead of once per text.
+
+        Args:
+            texts (list): Texts to analyze
+
+        Returns:
+            list: Combined sentiment analysis per text, in input order
+        """
+        results = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            if text and len(text.strip()) >= 3:
+                results[i] = self._get_cached(text.strip())
+                if results[i] is None:
+                    pending.append(i)
+
+        try:
+            analyzed = self._analyze_batch([texts[i].strip() for i in pending]) if pending else []
+        except Exception as e:
+            logger.error(f"Batch sentiment analysis failed: {e}")
+            analyzed = []
+
+        for i, result in zip(pending, analyzed):
+            results[i] = result
+        return [result or self._default_sentiment() for result in results]
+
+    def _get_cached(self, text: str) -> Optional[Dict]:
+        """Return the cached analysis for a stripped text."""
+        with self._cache_lock:
+            result = self._cache.get(text)
+            if result is not None:
+                self._cache.move_to_end(text)
+            return result
+
+    def _store(self, text: str, result: Dict):
+        """Cache an analysis produced by both models; they are deterministic, so it never goes stale."""
+        with self._cache_lock:
+            self._cache[text] = result
+            if len(self._cache) > SENTIMENT_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def _analyze_batch(self, texts: List[str]) -> List[Dict]:
+        """Run both models over the texts, combine and cache their results."""
+        # Truncate long text, keeping the caller's text as the cache key
+        keys = texts
+        texts = [text[:MAX_TEXT_CHARS] for text in texts]
+
+        # The models are independent and torch releases the GIL during the
+        # forward pass, so the wall time is the slower model rather than the sum
+        nuanced_future = self._model_executor.submit(self._get_nuanced_sentiments, texts)
+        base_results = self._get_base_sentiments(texts)
+        nuanced_results = nuanced_future.result()
+
+        # Placeholders stand in for a failed model but are never cached
+        from_models = base_results is not None and nuanced_results is not None
+        if base_results is None:
+            base_results = [{"label": "neutral", "confidence": 0.5} for _ in texts]
+        if nuanced_results is None:
+            nuanced_results = [{"label": "neutral", "confidence": 0.5} for _ in texts]
+
+        results = [
+            {
                 "base_sentiment": base_result,
                 "nuanced_sentiment": nuanced_result,
                 "combined_label": self._combine_sentiments(base_result, nuanced_result)
             }
+            for base_result, nuanced_result in zip(base_results, nuanced_results)
+        ]
+        if from_models:
+            for key, result in zip(keys, results):
+                self._store(key, result)
+        return results
 
-        except Exception as e:
-            logger.error(f"Sentiment analysis failed: {e}")
-            return self._default_sentiment()
+    def _start_batch_worker(self):
+        """Start the micro-batching worker thread once per instance."""
+        with self._worker_lock:
+            if self._queue is None:
+                self._queue = queue.Queue()
+                threading.Thread(
+                    target=self._batch_worker, name="sentiment-batcher", daemon=True
+                ).start()
+
+    def _batch_worker(self):
+        """Coalesce queued texts into batches and resolve their futures."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + BATCH_WAIT
+
+            while len(batch) < MAX_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
 
-    def _get_base_sentiment(self, text: str) -> Dict:
-        """Get base sentiment analysis."""
+            texts = [text for text, _ in batch]
+            try:
+                for (_, future), result in zip(batch, self._analyze_batch(texts)):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _get_base_sentiments(self, texts: List[str]) -> Optional[List[Dict]]:
+        """Get base sentiment analysis for each text, or None if the model can't run."""
         if self.base_model:
             try:
-                result = self.base_model(text, truncation=True)[0]
-                return {
-                    "label": result["label"].lower(),
-                    "confidence": round(result["score"], 3)
-                }
-            except:
-                pass
-        return {"label": "neutral", "confidence": 0.5}
+                results = self.base_model(texts)
+                return [
+                    {"label": result["label"].lower(), "confidence": round(result["score"], 3)}
+                    for result in results
+                ]
+            except Exception as e:
+                logger.warning(f"Base sentiment model failed: {e}")
+        return None
 
-    def _get_nuanced_sentiment(self, text: str) -> Dict:
-        """Get nuanced sentiment analysis."""
+    def _get_nuanced_sentiments(self, texts: List[str]) -> Optional[List[Dict]]:
+        """Get nuanced sentiment analysis for each text, or None if the model can't run."""
         if self.nuanced_model:
             try:
-                result = self.nuanced_model(text, truncation=True)[0]
-                # Map Cardiff model labels to standard format
-                label_mapping = {
-                    "LABEL_0": "negative",
-                    "LABEL_1": "neutral", 
-                    "LABEL_2": "positive"
-                }
-                mapped_label = label_mapping.get(result["label"], result["label"].lower())
-
-                return {
-                    "label": mapped_label,
-                    "confidence": round(result["score"], 3)
-                }
-            except:
-                pass
-        return {"label": "neutral", "confidence": 0.5}
+                results = self.nuanced_model(texts)
+                return [
+                    {
+                        "label": _NUANCED_LABELS.get(result["label"], result["label"].lower()),
+                        "confidence": round(result["score"], 3)
+                    }
+                    for result in results
+                ]
+            except Exception as e:
+                logger.warning(f"Nuanced sentiment model failed: {e}")
+        return None
 
     def _combine_sentiments(self, base: Dict, nuanced: Dict) -> str:
         """Combine base and nuanced sentiment into single label."""
@@ -138,14 +389,34 @@ class SentimentFusion:
 
 # Global fusion instance
 _fusion = None
+_fusion_lock = threading.Lock()
+_background_load_started = False
 
 def get_fusion() -> SentimentFusion:
-    """Get or create global sentiment fusion instance."""
+    """Get or create global sentiment fusion instance, waiting on any load in progress."""
     global _fusion
     if _fusion is None:
-        _fusion = SentimentFusion()
+        with _fusion_lock:
+            if _fusion is None:
+                _fusion = SentimentFusion()
     return _fusion
 
+def load_fusion_in_background():
+    """Start loading the sentiment models on a daemon thread, once per process."""
+    global _background_load_started
+    with _fusion_lock:
+        if _background_load_started or _fusion is not None:
+            return
+        _background_load_started = True
+
+    def _load():
+        try:
+            get_fusion()
+        except Exception as e:
+            logger.error(f"Background sentiment model load failed: {e}")
+
+    threading.Thread(target=_load, name="sentiment-loader", daemon=True).start()
+
 def fuse_sentiment_emotion(text: str, emotion_label: str = None) -> str:
     """
     Create fused emotion-sentiment label.
@@ -160,13 +431,46 @@ def fuse_sentiment_emotion(text: str, emotion_label: str = None) -> str:
     try:
         fusion = get_fusion()
         sentiment_result = fusion.analyze_sentiment(text)
-        base_sentiment = sentiment_result["combined_label"]
-
-        if emotion_label:
-            return f"{base_sentiment}-{emotion_label}"
-        else:
-            return base_sentiment
+        return combine_labels(sentiment_result["combined_label"], emotion_label)
 
     except Exception as e:
         logger.error(f"Sentiment fusion failed: {e}")
-        return f"neutral-{emotion_label}" if emotion_label else "neutral"
+        return combine_labels("neutral", emotion_label)
+
+def fuse_sentiment_emotion_batch(texts: List[str], emotion_labels: List[Optional[str]]) -> List[str]:
+    """
+    Create fused emotion-sentiment labels for many texts in one pass.
+
+    Args:
+        texts (list): Input texts
+        emotion_labels (list): Emotion per text from emotion detection
+
+    Returns:
+        list: Fused labels, in input order
+    """
+    try:
+        fusion = get_fusion()
+        sentiment_results = fusion.analyze_sentiments_batch(texts)
+        return [
+            combine_labels(result["combined_label"], emotion_label)
+            for result, emotion_label in zip(sentiment_results, emotion_labels)
+        ]
+
+    except Exception as e:
+        logger.error(f"Batch sentiment fusion failed: {e}")
+        return [combine_labels("neutral", emotion_label) for emotion_label in emotion_labels]
+
+def combine_labels(base_sentiment: str, emotion_label: str = None) -> str:
+    """
+    Join a sentiment label and an emotion label into a fused label.
+
+    Args:
+        base_sentiment (str): Combined sentiment label
+        emotion_label (str): Emotion from emotion detection
+
+    Returns:
+        str: Fused label like 'negative-sadness', or the sentiment alone
+    """
+    if emotion_label:
+        return f"{base_sentiment}-{emotion_label}"
+    return base_sentiment